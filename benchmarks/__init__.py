@@ -0,0 +1,84 @@
+"""
+Micro-benchmarks for the Headline API.
+
+Each module runs on its own with `python -m benchmarks.<name>`; the
+comparisons of old and new implementations live in the bench_* modules and
+the regression suite over the API hot paths in benchmarks.suite.
+Benchmarks needing a database use the testing configuration, so TEST_DB
+picks it.
+"""
+import base64
+import contextlib
+import time
+
+from config import config
+from headline import db, create_app
+from headline.models import User
+
+
+@contextlib.contextmanager
+def bench_app(**settings):
+    """
+    Yield a testing app with its tables created and a single user.
+
+    The user's credentials are bench_user / bench_password. Keyword
+    arguments override values of the testing configuration.
+    """
+    app = create_app_with(settings)
+    with app.app_context():
+        db.create_all()
+        try:
+            user = User(username='bench_user', email='bench@user.com')
+            user.hash_password('bench_password')
+            user.save()
+            yield app
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+def create_app_with(settings):
+    """Create a testing app whose configuration is overridden by settings."""
+    config['bench'] = type('BenchConfig', (config['testing'],), settings)
+    try:
+        return create_app('bench')
+    finally:
+        del config['bench']
+
+
+def auth_headers(token):
+    """Build the basic auth headers carrying a token."""
+    if isinstance(token, str):
+        token = token.encode('utf-8')
+    credentials = base64.b64encode(token + b':').decode('utf-8')
+    return {'Authorization': 'Basic ' + credentials}
+
+
+def percentile(samples, percent):
+    """Return the given percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * percent / 100.0))
+    return ordered[index]
+
+
+def sample(func, number, batch=1):
+    """Call func number * batch times; return the seconds of each call."""
+    samples = []
+    for _ in range(number):
+        start = time.perf_counter()
+        for _ in range(batch):
+            func()
+        samples.append((time.perf_counter() - start) / batch)
+    return samples
+
+
+def summarize(samples, elapsed=None):
+    """Return throughput and latency percentiles of a list of samples."""
+    elapsed = elapsed if elapsed is not None else sum(samples)
+    return {
+        'count': len(samples),
+        'ops_per_sec': len(samples) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000
+    }
@@ -0,0 +1,51 @@
+"""
+Benchmark response compression.
+
+Compresses JSend pages of serialized users of growing size with gzip and
+deflate at the configured level, and reports bytes on the wire and the
+CPU time per response. Run with:
+
+    python -m benchmarks.bench_compression
+"""
+import time
+
+from flask import json
+
+from config import config
+from headline import create_app
+from headline.compression import compress
+from headline.models import User
+
+from .bench_serialize import make_users
+
+
+def run(counts=(1, 10, 100, 1000, 10000), level=None):
+    """Run the benchmark and return (users, size, coding, out, ms) rows."""
+    level = level or config['default'].COMPRESS_LEVEL
+    rows = []
+    with create_app('testing').app_context():
+        for count in counts:
+            page = {'status': 'success',
+                    'data': User.serialize_many(make_users(count))}
+            data = json.dumps(page, separators=(',', ':')).encode('utf-8')
+            for encoding in ('gzip', 'deflate'):
+                repeat = max(1, 2000 // count)
+                start = time.process_time()
+                for _ in range(repeat):
+                    compressed = compress(data, encoding, level)
+                seconds = (time.process_time() - start) / repeat
+                rows.append((count, len(data), encoding, len(compressed),
+                             seconds * 1000))
+    return rows
+
+
+def main():
+    print('{:>6} {:>9} {:<8} {:>9} {:>7} {:>9}'.format(
+        'users', 'bytes', 'coding', 'on wire', 'ratio', 'cpu ms'))
+    for count, size, encoding, out, ms in run():
+        print('{:>6} {:>9} {:<8} {:>9} {:>6.1%} {:>9.3f}'.format(
+            count, size, encoding, out, out / size, ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Stress push ID generation across threads and forked processes.
+
+Counts duplicate IDs and measures throughput for a single PushID shared
+without a lock (the old module level generator), a shared PushID behind a
+lock, and LocalPushID. Run with:
+
+    python -m benchmarks.bench_id_concurrency
+"""
+import multiprocessing
+import threading
+import time
+
+from headline.id_generator import LocalPushID, PushID
+
+
+class LockedPushID(object):
+    """A shared PushID serialized with a lock, for comparison."""
+
+    def __init__(self):
+        self.generator = PushID()
+        self.lock = threading.Lock()
+
+    def next_id(self):
+        with self.lock:
+            return self.generator.next_id()
+
+
+def run_threads(generator, threads=8, per_thread=50000):
+    """Generate IDs on several threads; return (ids/sec, duplicates)."""
+    results = []
+
+    def work():
+        next_id = generator.next_id
+        results.append([next_id() for _ in range(per_thread)])
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    ids = [unique_id for batch in results for unique_id in batch]
+    return len(ids) / elapsed, len(ids) - len(set(ids))
+
+
+_process_generator = LocalPushID()
+
+
+def _process_work(per_process):
+    next_id = _process_generator.next_id
+    return [next_id() for _ in range(per_process)]
+
+
+def run_processes(processes=4, per_process=100000):
+    """Generate IDs on forked workers; return (ids/sec, duplicates)."""
+    _process_generator.next_id()
+    context = multiprocessing.get_context('fork')
+    with context.Pool(processes) as pool:
+        start = time.perf_counter()
+        batches = pool.map(_process_work, [per_process] * processes)
+        elapsed = time.perf_counter() - start
+    ids = [unique_id for batch in batches for unique_id in batch]
+    return len(ids) / elapsed, len(ids) - len(set(ids))
+
+
+def main():
+    rows = [
+        ('threads, shared PushID', run_threads(PushID())),
+        ('threads, locked PushID', run_threads(LockedPushID())),
+        ('threads, LocalPushID', run_threads(LocalPushID())),
+        ('forked processes, LocalPushID', run_processes()),
+    ]
+    for label, (rate, duplicates) in rows:
+        print('{:<32} {:>12,.0f} ids/sec {:>8} duplicates'.format(
+            label, rate, duplicates))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark push ID generation.
+
+Compares the table-driven single and batch paths of PushID against the
+original NumPy based implementation. Run with:
+
+    python -m benchmarks.bench_id_generator
+"""
+from random import random
+from time import time
+import timeit
+
+from headline.id_generator import PushID
+
+
+class LegacyPushID(object):
+    """The per-character NumPy implementation PushID used to ship with."""
+
+    PUSH_CHARS = PushID.PUSH_CHARS
+
+    def __init__(self):
+        import numpy
+        self.numpy = numpy
+        self.last_push_time = 0
+        self.last_rand_chars = numpy.empty(12, dtype=int)
+
+    def next_id(self):
+        now = int(time() * 1000)
+        duplicate_time = (now == self.last_push_time)
+        self.last_push_time = now
+        time_stamp_chars = self.numpy.empty(8, dtype=str)
+
+        for i in range(7, -1, -1):
+            time_stamp_chars[i] = self.PUSH_CHARS[now % 64]
+            now = int(now / 64)
+
+        unique_id = ''.join(time_stamp_chars)
+
+        if not duplicate_time:
+            for i in range(12):
+                self.last_rand_chars[i] = int(random() * 64)
+        else:
+            for i in range(11, -1, -1):
+                if self.last_rand_chars[i] == 63:
+                    self.last_rand_chars[i] = 0
+                else:
+                    break
+            self.last_rand_chars[i] += 1
+
+        for i in range(12):
+            unique_id += self.PUSH_CHARS[self.last_rand_chars[i]]
+        return unique_id
+
+
+def ids_per_second(func, ids_per_call, number):
+    """Time `func` and return the number of IDs produced per second."""
+    elapsed = min(timeit.repeat(func, number=number, repeat=3))
+    return ids_per_call * number / elapsed
+
+
+def run(total=100000, batch=1000):
+    """Run the benchmark and return a list of (label, ids/sec) rows."""
+    rows = []
+    try:
+        legacy = LegacyPushID()
+    except ImportError:
+        legacy = None
+    if legacy is not None:
+        rows.append(('legacy next_id (numpy)',
+                     ids_per_second(legacy.next_id, 1, total)))
+
+    generator = PushID()
+    rows.append(('next_id', ids_per_second(generator.next_id, 1, total)))
+    rows.append(('next_ids({})'.format(batch),
+                 ids_per_second(lambda: generator.next_ids(batch), batch,
+                                total // batch)))
+    return rows
+
+
+def main():
+    for label, rate in run():
+        print('{:<28} {:>14,.0f} ids/sec'.format(label, rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark response encoding.
+
+Encodes a page of 100 serialized users and a 400 error envelope with
+flask.jsonify, then with headline.encoding on every installed engine, and
+reports responses per second. Run with:
+
+    python -m benchmarks.bench_json
+"""
+import time
+
+from flask import jsonify
+
+from headline import create_app, encoding, errors
+from headline.models import User
+
+from .bench_serialize import make_users
+
+
+def throughput(func, seconds=1.0):
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(100):
+            func()
+        calls += 100
+    return calls / (time.perf_counter() - start)
+
+
+def error_envelope():
+    return jsonify({'status': 'error', 'details': {
+        'status': 400, 'error': 'Bad Request',
+        'message': 'Email field is missing.'}})
+
+
+def run():
+    """Run the benchmark and return (label, page/s, error/s) rows."""
+    app = create_app('testing')
+    rows = []
+    with app.test_request_context():
+        page = {'status': 'success',
+                'data': User.serialize_many(make_users(100))}
+        for pretty in (True, False):
+            app.config['JSONIFY_PRETTYPRINT_REGULAR'] = pretty
+            rows.append(('flask.jsonify{}'.format(
+                ' (pretty)' if pretty else ''),
+                throughput(lambda: jsonify(page)),
+                throughput(error_envelope)))
+        for name, engine in encoding.ENGINES.items():
+            if engine is None:
+                continue
+            app.config['JSON_ENGINE'] = name
+            encoding.configure(app)
+            rows.append(('encoding ' + name,
+                         throughput(lambda: encoding.jsonify(page)),
+                         throughput(lambda: errors.bad_request(
+                             'Email field is missing.'))))
+    return rows
+
+
+def main():
+    for label, pages, envelopes in run():
+        print('{:<26} {:>9.0f} pages/s {:>9.0f} errors/s'.format(
+            label, pages, envelopes))
+
+
+if __name__ == '__main__':
+    main()
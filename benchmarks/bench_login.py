@@ -0,0 +1,65 @@
+"""
+Benchmark login latency under concurrent load.
+
+Several threads sign in through POST /auth/login while others call the
+cheap GET /auth/me, with passwords hashed inline and on the hashing pool.
+Reports p50/p99 latency for both endpoints. Run with:
+
+    python -m benchmarks.bench_login
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+
+from benchmarks import auth_headers, bench_app, percentile, sample
+from headline.models import User
+
+LOGIN = json.dumps({'username': 'bench_user', 'password': 'bench_password'})
+
+
+def run_load(app, login_threads=8, cheap_threads=4, number=25):
+    """Drive both endpoints at once; return login and cheap latencies."""
+    token = User.find_first(username='bench_user').generate_auth_token()
+    headers = auth_headers(token)
+
+    def login():
+        client = app.test_client()
+        return sample(lambda: client.post(
+            '/auth/login', data=LOGIN, content_type='application/json'),
+            number)
+
+    def cheap():
+        client = app.test_client()
+        return sample(lambda: client.get('/auth/me', headers=headers),
+                     number * 4)
+
+    with ThreadPoolExecutor(login_threads + cheap_threads) as executor:
+        logins = [executor.submit(login) for _ in range(login_threads)]
+        cheaps = [executor.submit(cheap) for _ in range(cheap_threads)]
+        return ([seconds for job in logins for seconds in job.result()],
+                [seconds for job in cheaps for seconds in job.result()])
+
+
+def run(method='pbkdf2:sha256:50000', workers=2):
+    """Run the benchmark inline and on the pool; return result rows."""
+    rows = []
+    for label, pool_size in (('inline', 0),
+                             ('pool of {}'.format(workers), workers)):
+        with bench_app(PASSWORD_HASH_METHOD=method,
+                       PASSWORD_HASH_WORKERS=pool_size) as app:
+            logins, cheaps = run_load(app)
+        rows.append((label, logins, cheaps))
+    return rows
+
+
+def main():
+    for label, logins, cheaps in run():
+        print('{:<12} login p50 {:6.1f}ms p99 {:6.1f}ms | '
+              '/auth/me p50 {:6.1f}ms p99 {:6.1f}ms'.format(
+                  label, percentile(logins, 50) * 1000,
+                  percentile(logins, 99) * 1000,
+                  percentile(cheaps, 50) * 1000,
+                  percentile(cheaps, 99) * 1000))
+
+
+if __name__ == '__main__':
+    main()
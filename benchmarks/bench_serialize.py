@@ -0,0 +1,67 @@
+"""
+Benchmark model serialization.
+
+Serializes 100k users with the per-row column walk Base.serialize used to
+do, with the compiled Base.serialize and with Base.serialize_many, each
+followed by JSON encoding. Run with:
+
+    python -m benchmarks.bench_serialize
+"""
+from datetime import datetime, timedelta
+import time
+
+from flask import json
+
+from headline import create_app
+from headline.helpers import to_camel_case
+from headline.models import User
+
+
+def legacy_serialize(obj):
+    return {to_camel_case(column.name): getattr(obj, column.name)
+            for column in obj.__table__.columns}
+
+
+def make_users(count):
+    created = datetime(2017, 10, 1)
+    return [User(id='-KyN3Cj4Ej0sZW8Q{:04d}'.format(i % 10000),
+                 username='user{}'.format(i), email='user{}@a.ng'.format(i),
+                 password='pbkdf2:sha256:50000$salt$hash', isVerified=False,
+                 token_version=0,
+                 date_created=created + timedelta(seconds=i % 3600),
+                 date_modified=created)
+            for i in range(count)]
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def run(count=100000):
+    """Run the benchmark and return (label, serialize secs, total secs)."""
+    users = make_users(count)
+    rows = []
+    with create_app('testing').app_context():
+        for label, serialize in (
+                ('legacy serialize', lambda: [legacy_serialize(user)
+                                              for user in users]),
+                ('compiled serialize', lambda: [user.serialize()
+                                                for user in users]),
+                ('serialize_many', lambda: User.serialize_many(users))):
+            result = []
+            seconds = timed(lambda: result.append(serialize()))
+            total = seconds + timed(lambda: json.dumps(result[0]))
+            rows.append((label, seconds, total))
+    return rows
+
+
+def main():
+    for label, seconds, total in run():
+        print('{:<20} serialize {:6.3f}s  serialize+encode {:6.3f}s'.format(
+            label, seconds, total))
+
+
+if __name__ == '__main__':
+    main()
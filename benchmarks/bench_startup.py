@@ -0,0 +1,75 @@
+"""
+Benchmark worker startup.
+
+Imports each entry module in a fresh interpreter, as a gunicorn worker
+without --preload would, and reports the import time and the peak RSS of
+the process. For the wsgi module it also forks after the import, as
+--preload does, and times a child's first request. Run with:
+
+    python -m benchmarks.bench_startup [module ...]
+"""
+import json
+import subprocess
+import sys
+
+from . import percentile
+
+IMPORT = '''
+import json, resource, sys, time
+start = time.perf_counter()
+try:
+    __import__({module!r})
+except Exception as error:
+    print(json.dumps({{'error': repr(error)}}))
+    sys.exit()
+print(json.dumps({{
+    'seconds': time.perf_counter() - start,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+'''
+
+FORK = '''
+import json, os, time
+from wsgi import app
+start = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    app.test_client().get('/')
+    os._exit(0)
+os.waitpid(pid, 0)
+print(json.dumps({'seconds': time.perf_counter() - start}))
+'''
+
+
+def measure(code):
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def run(modules=('wsgi', 'manage'), repeat=5):
+    """Run the benchmark and return (label, median ms, rss kB) rows."""
+    rows = []
+    for module in modules:
+        results = [measure(IMPORT.format(module=module))
+                   for _ in range(repeat)]
+        if 'error' in results[0]:
+            rows.append(('import ' + module, results[0]['error'], None))
+            continue
+        rows.append(('import ' + module,
+                     percentile([r['seconds'] for r in results], 50) * 1000,
+                     max(r['rss_kb'] for r in results)))
+    forks = [measure(FORK)['seconds'] for _ in range(repeat)]
+    rows.append(('fork + first request', percentile(forks, 50) * 1000, None))
+    return rows
+
+
+def main():
+    for label, ms, rss in run(tuple(sys.argv[1:]) or ('wsgi', 'manage')):
+        if isinstance(ms, str):
+            print('{:<22} failed: {}'.format(label, ms))
+            continue
+        print('{:<22} {:8.1f} ms{}'.format(
+            label, ms, '  {:8d} kB RSS'.format(rss) if rss else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark a token-protected endpoint.
+
+Measures requests/sec on GET /auth/me through the test client with
+DB-backed token verification (identity cache off and on) and with claims
+tokens. Run with:
+
+    python -m benchmarks.bench_token_auth
+"""
+import time
+
+from benchmarks import auth_headers, bench_app
+from headline.models import User, identity_cache
+
+
+def requests_per_second(client, headers, number):
+    """Issue `number` GET /auth/me requests and return requests/sec."""
+    start = time.perf_counter()
+    for _ in range(number):
+        response = client.get('/auth/me', headers=headers)
+        assert response.status_code == 200
+    return number / (time.perf_counter() - start)
+
+
+def run(number=2000):
+    """Run the benchmark and return a list of (label, requests/sec) rows."""
+    rows = []
+    with bench_app() as app:
+        user = User.find_first(username='bench_user')
+        db_token = auth_headers(user.generate_auth_token())
+        claims_token = auth_headers(user.generate_claims_token())
+
+        client = app.test_client()
+        identity_cache.configure(0, 0)
+        rows.append(('DB-backed verify',
+                     requests_per_second(client, db_token, number)))
+        identity_cache.configure(app.config['IDENTITY_CACHE_SIZE'],
+                                 app.config['IDENTITY_CACHE_TTL'])
+        rows.append(('DB-backed verify, identity cache',
+                     requests_per_second(client, db_token, number)))
+        app.config['USE_CLAIMS_TOKENS'] = True
+        rows.append(('claims token verify',
+                     requests_per_second(client, claims_token, number)))
+    return rows
+
+
+def main():
+    for label, rate in run():
+        print('{:<34} {:>10,.0f} requests/sec'.format(label, rate))
+
+
+if __name__ == '__main__':
+    main()
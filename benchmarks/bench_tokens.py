@@ -0,0 +1,56 @@
+"""
+Benchmark token issue and verify.
+
+Compares building a TimedJSONWebSignatureSerializer on every call, as the
+token methods used to, with the cached TokenCodec. Run with:
+
+    python -m benchmarks.bench_tokens
+"""
+import timeit
+
+from itsdangerous import TimedJSONWebSignatureSerializer
+
+from headline.tokens import TokenCodec
+
+SECRET_KEY = 'benchmark-secret-key'
+PAYLOAD = {'id': '-KyN3Cj4Ej0sZW8QF_lM'}
+
+
+def legacy_issue():
+    serializer = TimedJSONWebSignatureSerializer(SECRET_KEY, expires_in=36000)
+    return serializer.dumps(PAYLOAD)
+
+
+def legacy_verify(token):
+    return TimedJSONWebSignatureSerializer(SECRET_KEY).loads(token)
+
+
+def per_second(func, number):
+    return number / min(timeit.repeat(func, number=number, repeat=3))
+
+
+def run(number=20000):
+    """Run the benchmark and return (label, ops/sec, token length) rows."""
+    codec = TokenCodec([SECRET_KEY, 'retired-secret-key'])
+    legacy_token = legacy_issue()
+    token = codec.dumps(PAYLOAD, 36000)
+    return [
+        ('legacy issue', per_second(legacy_issue, number),
+         len(legacy_token)),
+        ('legacy verify', per_second(lambda: legacy_verify(legacy_token),
+                                     number), len(legacy_token)),
+        ('codec issue', per_second(lambda: codec.dumps(PAYLOAD, 36000),
+                                   number), len(token)),
+        ('codec verify', per_second(lambda: codec.loads(token), number),
+         len(token)),
+    ]
+
+
+def main():
+    for label, rate, length in run():
+        print('{:<16} {:>10,.0f} ops/sec {:>6} chars'.format(
+            label, rate, length))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+End-to-end benchmark suite for the API hot paths.
+
+Measures PushID generation, token issue and verification, serialization,
+registration, login and a token-protected endpoint, and reports throughput
+with p50/p95/p99 latency. Runs offline against SQLite, or against Postgres
+with --database. Results can be saved as a baseline and later runs checked
+against it:
+
+    python -m benchmarks.suite --save baseline.json
+    python -m benchmarks.suite --compare baseline.json --threshold 0.2
+
+The load mode drives the login, token-protected and registration
+endpoints concurrently, through the test client or against a running
+server such as a local gunicorn:
+
+    python -m benchmarks.suite --load --concurrency 16 --duration 10
+    python -m benchmarks.suite --load --url http://127.0.0.1:8000
+
+Every load request comes from one address, so a server with rate limits on
+answers most of them with 429 after the first few logins. Start it with
+USE_RATE_LIMITS=False in its environment; rate limited requests are
+counted and reported.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+import argparse
+import json
+import platform
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from config import config
+from headline.models import User, push_id
+from headline.tokens import get_codec
+
+from . import auth_headers, bench_app, sample, summarize
+from .bench_serialize import make_users
+
+PASSWORD = 'bench_password'
+
+
+def bench_cases(app, number):
+    """Run every case against app; return their summaries by name."""
+    client = app.test_client()
+    user = User.find_first(username='bench_user')
+    headers = auth_headers(user.generate_auth_token())
+    token = get_codec().dumps({'id': user.id}, 3600)
+    users = make_users(1)
+    login = json.dumps({'username': 'bench_user', 'password': PASSWORD})
+    names = ('bench{}'.format(i) for i in count())
+
+    def register():
+        name = next(names)
+        client.post('/auth/register', content_type='application/json',
+                    data=json.dumps({'username': name, 'password': PASSWORD,
+                                     'email': name + '@user.com'}))
+
+    cases = (
+        ('push_id.next_id', lambda: sample(push_id.next_id, number, 100)),
+        ('token.issue', lambda: sample(
+            lambda: get_codec().dumps({'id': user.id}, 3600), number, 10)),
+        ('token.verify', lambda: sample(
+            lambda: get_codec().loads(token), number, 10)),
+        ('User.serialize', lambda: sample(users[0].serialize, number, 10)),
+        ('POST /auth/register', lambda: sample(register, number // 10)),
+        ('POST /auth/login', lambda: sample(lambda: client.post(
+            '/auth/login', data=login, content_type='application/json'),
+            number // 10)),
+        ('GET /auth/me', lambda: sample(
+            lambda: client.get('/auth/me', headers=headers), number)))
+    return {name: summarize(case()) for name, case in cases}
+
+
+class ClientTarget(object):
+    """Send requests to an app through a test client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, data=body,
+                               headers=headers,
+                               content_type='application/json')
+        return response.status_code, response.get_data()
+
+
+class HTTPTarget(object):
+    """Send requests to a running server."""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {}, **{'Content-Type': 'application/json'})
+        request = urllib.request.Request(
+            self.url + path, method=method, headers=headers,
+            data=body.encode('utf-8') if body is not None else None)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+
+def run_load(target, concurrency=8, duration=5.0):
+    """
+    Drive the hot endpoints concurrently for duration seconds.
+
+    Each worker signs up its own user, then loops over nine token-protected
+    calls for every login. Returns summaries, error and rate limited counts
+    by endpoint.
+    """
+    run_id = int(time.time() * 1000)
+    lock = threading.Lock()
+    samples = {}
+    errors = {}
+    limited = {}
+
+    def timed(label, *args):
+        start = time.perf_counter()
+        status, body = target.request(*args)
+        seconds = time.perf_counter() - start
+        with lock:
+            samples.setdefault(label, []).append(seconds)
+            if status >= 400:
+                errors[label] = errors.get(label, 0) + 1
+            if status == 429:
+                limited[label] = limited.get(label, 0) + 1
+        return status, body
+
+    def worker(index):
+        name = 'load{}_{}'.format(run_id, index)
+        timed('POST /auth/register', 'POST', '/auth/register', json.dumps(
+            {'username': name, 'password': PASSWORD,
+             'email': name + '@user.com'}))
+        login = json.dumps({'username': name, 'password': PASSWORD})
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            status, body = timed('POST /auth/login', 'POST', '/auth/login',
+                                 login)
+            if status != 200:
+                continue
+            token = json.loads(body.decode('utf-8'))['data']['token']
+            for _ in range(9):
+                timed('GET /auth/me', 'GET', '/auth/me', None,
+                      auth_headers(token))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for job in [executor.submit(worker, index)
+                    for index in range(concurrency)]:
+            job.result()
+    elapsed = time.perf_counter() - start
+    return {label: dict(summarize(values, elapsed),
+                        errors=errors.get(label, 0),
+                        rate_limited=limited.get(label, 0))
+            for label, values in samples.items()}
+
+
+def compare(results, baseline, threshold):
+    """
+    Return the regressions of results against a baseline.
+
+    A case regresses when its throughput drops, or its p99 latency rises,
+    by more than threshold, a fraction.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['ops_per_sec'] < before['ops_per_sec'] * (1 - threshold):
+            regressions.append('{}: {:.0f} ops/s, baseline {:.0f}'.format(
+                name, result['ops_per_sec'], before['ops_per_sec']))
+        if result['p99_ms'] > before['p99_ms'] * (1 + threshold):
+            regressions.append('{}: p99 {:.3f} ms, baseline {:.3f}'.format(
+                name, result['p99_ms'], before['p99_ms']))
+    return regressions
+
+
+def report(results):
+    print('{:<22} {:>11} {:>10} {:>10} {:>10}'.format(
+        'case', 'ops/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for name, result in sorted(results.items()):
+        print('{:<22} {:>11.0f} {:>10.3f} {:>10.3f} {:>10.3f}{}'.format(
+            name, result['ops_per_sec'], result['p50_ms'], result['p95_ms'],
+            result['p99_ms'], '  ({} errors)'.format(result['errors'])
+            if result.get('errors') else ''))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database', help='database URI, default TEST_DB')
+    parser.add_argument('--number', type=int, default=2000,
+                        help='samples per case')
+    parser.add_argument('--hash-method',
+                        default=config['production'].PASSWORD_HASH_METHOD)
+    parser.add_argument('--load', action='store_true',
+                        help='drive the endpoints concurrently instead')
+    parser.add_argument('--url', help='server to load instead of the app')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--save', metavar='FILE', help='save as a baseline')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='check against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed regression, a fraction')
+    args = parser.parse_args(argv)
+
+    settings = {'PASSWORD_HASH_METHOD': args.hash_method}
+    if args.database:
+        settings['SQLALCHEMY_DATABASE_URI'] = args.database
+    if args.load and args.url:
+        results = run_load(HTTPTarget(args.url), args.concurrency,
+                           args.duration)
+    else:
+        with bench_app(**settings) as app:
+            if args.load:
+                results = run_load(ClientTarget(app), args.concurrency,
+                                   args.duration)
+            else:
+                results = bench_cases(app, args.number)
+    report(results)
+    limited = sum(result.get('rate_limited', 0)
+                  for result in results.values())
+    if limited:
+        print('{} requests were rate limited; run the server with '
+              'USE_RATE_LIMITS=False.'.format(limited), file=sys.stderr)
+
+    if args.save:
+        with open(args.save, 'w') as baseline:
+            json.dump({'python': platform.python_version(),
+                       'results': results}, baseline, indent=2,
+                      sort_keys=True)
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline)['results'],
+                                  args.threshold)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,13 +19,112 @@ class Config:
     """
 
     SECRET_KEY = dotenv.get("SECRET_KEY")
+    # Previous secret keys, comma separated, still accepted for verification.
+    OLD_SECRET_KEYS = [key for key in str(dotenv.get("OLD_SECRET_KEYS", ""))
+                       .split(",") if key]
+    # Accept JSON web signature tokens issued before the compact format.
+    ACCEPT_LEGACY_TOKENS = True
     SQLALCHEMY_COMMIT_ON_TEARDOWN = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Read replicas, comma separated; reads are spread across them.
+    SQLALCHEMY_REPLICA_URIS = [
+        uri for uri in str(dotenv.get("DATABASE_REPLICA_URLS", "")).split(",")
+        if uri]
+    # Seconds a replica that failed is left out of rotation.
+    REPLICA_RETRY_AFTER = 30
+    # Connections per worker and engine; a deployment opens up to
+    # workers * (POOL_SIZE + MAX_OVERFLOW) connections to each database.
+    SQLALCHEMY_POOL_SIZE = 5
+    SQLALCHEMY_MAX_OVERFLOW = 10
+    # Seconds to wait for a free connection, and to keep one before
+    # replacing it.
+    SQLALCHEMY_POOL_TIMEOUT = 10
+    SQLALCHEMY_POOL_RECYCLE = 1800
+    # Test connections on checkout so dropped ones are replaced.
+    SQLALCHEMY_POOL_PRE_PING = True
     USE_TOKEN_AUTH = True
     DEBUG = False
     SSLIFY_SUBDOMAINS = True
+    # JSON engine for responses: orjson, rapidjson, stdlib, or auto for the
+    # fastest one installed. Responses are compact unless pretty printed.
+    JSON_ENGINE = 'auto'
+    JSONIFY_PRETTYPRINT_REGULAR = False
+    # Cache-Control of successful GET responses, per endpoint, which are
+    # revalidated with their ETag by default.
+    CACHE_CONTROL_DEFAULT = 'private, no-cache'
+    CACHE_CONTROL = {}
+    # gzip/deflate responses of these types once they reach COMPRESS_MIN_SIZE
+    # bytes, keeping the compressed bytes of tagged responses for reuse.
+    COMPRESS = True
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIMETYPES = ['application/json', 'text/html', 'text/plain',
+                          'text/css', 'application/javascript']
+    COMPRESS_CACHE_SIZE = 256
+    COMPRESS_CACHE_TTL = 300
     DEFAULT_PER_PAGE = 20
     MAX_PER_PAGE = 100
+    # Cached exact counts and for how many seconds writes in other workers
+    # may go unnoticed.
+    COUNT_CACHE_SIZE = 1000
+    COUNT_CACHE_TTL = 30
+    # Paginated totals from Postgres' planner estimate once it reaches this
+    # many rows; None always counts exactly.
+    COUNT_ESTIMATE_THRESHOLD = None
+    # Push characters embedded in every generated ID to tell hosts apart.
+    PUSH_ID_NODE = str(dotenv.get("PUSH_ID_NODE", ""))
+    # Rows kept in each worker's identity cache and for how many seconds.
+    IDENTITY_CACHE_SIZE = 10000
+    IDENTITY_CACHE_TTL = 60
+    # Issue tokens carrying the user's claims, verified without the database,
+    # valid for at most CLAIMS_TOKEN_EXPIRATION seconds.
+    USE_CLAIMS_TOKENS = False
+    CLAIMS_TOKEN_EXPIRATION = 900
+    # A TokenVersionStore shared by all workers, publishing revocations of
+    # claims tokens. None keeps them in the revoking process, so other
+    # workers, or this one after a restart, accept revoked tokens until
+    # they expire.
+    TOKEN_VERSION_STORE = None
+    # Password key derivation method and work factor. Stored hashes made
+    # with another method are rehashed on login.
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:50000'
+    # Processes hashing passwords off the request thread (0 hashes inline),
+    # jobs allowed to queue for them and seconds a request waits. Each
+    # worker starts its own; they only help threaded workers, whose other
+    # threads keep serving while a hash runs, and cost sync workers a
+    # process each for nothing, so keep 0 there.
+    PASSWORD_HASH_WORKERS = 0
+    PASSWORD_HASH_QUEUE = 16
+    PASSWORD_HASH_TIMEOUT = 5
+    # Count and time each request's statements, send them in a
+    # Server-Timing header and log statements repeated this many times.
+    SQL_PROFILING = False
+    SQL_PROFILING_REPEAT_THRESHOLD = 5
+    # Requests per endpoint kept in the rolling summary.
+    SQL_PROFILING_WINDOW = 100
+    # Per-endpoint latency histograms (bucket bounds in seconds), status
+    # counts and DB time, served on /metrics. Workers share them through
+    # METRICS_DIR, writing at most every METRICS_FLUSH_INTERVAL seconds.
+    METRICS = True
+    METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                       10)
+    METRICS_DIR = dotenv.get("METRICS_DIR")
+    METRICS_FLUSH_INTERVAL = 1
+    # Requests each worker runs at once per endpoint class, how many more
+    # wait and for how many seconds before being shed with a 503, and the
+    # Retry-After sent then. "hashing" covers login and registration. The
+    # limits count a worker's threads, so they need threaded workers (the
+    # Procfile runs 16 per worker); concurrency plus queue stays below the
+    # thread count so other routes always find a free thread.
+    ADMISSION_LIMITS = {
+        'hashing': {'concurrency': 4, 'queue': 8, 'timeout': 2,
+                    'retry_after': 1}
+    }
+    # USE_RATE_LIMITS=False in the environment turns them off, e.g. for a
+    # server under benchmarks.suite --load.
+    USE_RATE_LIMITS = dotenv.get("USE_RATE_LIMITS", True)
+    # A RateLimitStore shared by all workers; None counts per process.
+    RATE_LIMIT_STORE = None
 
 
 class DevelopmentConfig(Config):
@@ -37,6 +136,8 @@ class DevelopmentConfig(Config):
 
     SQLALCHEMY_DATABASE_URI = dotenv.get("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = True
+    SQL_PROFILING = True
+    JSONIFY_PRETTYPRINT_REGULAR = True
     DEBUG = True
 
 
@@ -49,7 +150,11 @@ class TestingConfig(Config):
 
     USE_RATE_LIMITS = False
     TESTING = True
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
     SQLALCHEMY_DATABASE_URI = dotenv.get("TEST_DB")
+    SQLALCHEMY_REPLICA_URIS = []
+    SQLALCHEMY_POOL_PRE_PING = False
+    METRICS_DIR = None
     SERVER_NAME = dotenv.get("SERVER_NAME")
 
 
@@ -61,6 +166,8 @@ class ProductionConfig(Config):
     """
 
     SQLALCHEMY_DATABASE_URI = dotenv.get("DATABASE_URL")
+    # the Procfile runs gthread workers
+    PASSWORD_HASH_WORKERS = 2
 
 
 # Object containing the different configuration classes.
@@ -3,13 +3,14 @@ Setup an initialization to delay the creation of the application after runtime.
 
 This helps to enable the use of blueprint.
 """
-from flask import Flask, jsonify
+from flask import Flask, render_template
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
 
 from config import config
+from headline import encoding
+from headline.replicas import RoutingSQLAlchemy
 
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
 
 
 def create_app(config_name):
@@ -22,6 +23,9 @@ def create_app(config_name):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     db.init_app(app)
+    encoding.configure(app)
+    from headline import replicas
+    replicas.init_app(app)
     app.config['CORS_HEADERS'] = 'Content-Type'
     cors = CORS(app)
     cors.init_app(app)
@@ -30,26 +34,76 @@ def create_app(config_name):
     from headline.auth import authentication as auth_blueprint
     app.register_blueprint(auth_blueprint, url_prefix='/auth')
 
+    # Tag the IDs generated by this application with its node discriminator.
+    from headline.models import count_cache, identity_cache, push_id
+    push_id.configure(app.config['PUSH_ID_NODE'])
+    identity_cache.configure(app.config['IDENTITY_CACHE_SIZE'],
+                             app.config['IDENTITY_CACHE_TTL'])
+    count_cache.configure(app.config['COUNT_CACHE_SIZE'],
+                          app.config['COUNT_CACHE_TTL'])
+
+    from headline.hashing import password_hasher
+    password_hasher.configure(app.config['PASSWORD_HASH_METHOD'],
+                              app.config['PASSWORD_HASH_WORKERS'],
+                              app.config['PASSWORD_HASH_QUEUE'],
+                              app.config['PASSWORD_HASH_TIMEOUT'])
+
+    from headline.tokens import token_versions
+    token_versions.configure(app.config['TOKEN_VERSION_STORE'])
+
+    from headline.rate_limit import rate_limiter
+    rate_limiter.configure(app.config['RATE_LIMIT_STORE'])
+
+    from headline.admission import admission
+    admission.configure(app.config['ADMISSION_LIMITS'])
+
+    # Record request metrics; registered first so that it runs last and
+    # sees the final response.
+    from headline import metrics
+    metrics.init_app(app)
+
+    # Compress large responses after they are tagged.
+    from headline import compression
+    compression.init_app(app)
+
+    # Answer unchanged GET requests with 304.
+    from headline import conditional
+    conditional.init_app(app)
+
+    # Count and time the SQL of every request when SQL_PROFILING is set.
+    from headline import profiling
+    profiling.init_app(app)
+
+    # Define root route
+    @app.route('/', methods=['GET'])
+    def index():
+        """
+        Index route for Headline NG API.
+
+        Doesn't require authentication, just there for the user to know
+        what's up.
+        """
+        return render_template('index.html')
+
     # handle default 404 exceptions with a custom response
+    not_found = encoding.PreEncoded(dict(
+        status=404, error='Not found', message='The requested URL was not '
+        'found on the server. If you entered the URL manually please check '
+        'your spelling and try again'), 404)
+
     @app.errorhandler(404)
     def resource_not_found(error):
-        response = jsonify(dict(status=404, error='Not found', message='The '
-                                'requested URL was not found on the server. If'
-                                ' you entered the URL manually please check '
-                                'your spelling and try again'))
-        response.status_code = 404
-        return response
+        return not_found.response()
 
     # handle default 500 exceptions with a custom response
+    server_error = encoding.PreEncoded(dict(
+        status=500, error='Internal server error', message="It is not you. "
+        "It is me. The server encountered an internal error and was unable "
+        "to complete your request.  Either the server is overloaded or "
+        "there is an error in the application"), 500)
+
     @app.errorhandler(500)
     def internal_server_error(error):
-        response = jsonify(dict(status=500, error='Internal server error',
-                                message="It is not you. It is me. The server "
-                                "encountered an internal error and was unable "
-                                "to complete your request.  Either the server "
-                                "is overloaded or there is an error in the "
-                                "application"))
-        response.status_code = 500
-        return response
+        return server_error.response()
 
     return app
@@ -0,0 +1,102 @@
+"""
+Admission control for the Headline API.
+
+Routes are grouped into endpoint classes, e.g. "hashing" for the routes
+deriving password hashes. Each class runs at most `concurrency` requests at
+once per worker; up to `queue` more wait for at most `timeout` seconds, and
+anything beyond that is shed so cheap requests aren't stuck behind them.
+
+The limits count the requests of one worker process, so they only take
+effect with threaded workers, such as gunicorn's gthread in the Procfile; a
+sync worker never runs more than one request at once.
+"""
+from time import monotonic
+import threading
+
+
+class ConcurrencyLimiter(object):
+    """A bounded number of slots with a bounded, timed wait queue."""
+
+    def __init__(self, concurrency, queue=0, timeout=1, retry_after=1):
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def acquire(self):
+        """Take a slot; return False, counting the request shed, if none."""
+        with self._cond:
+            if self.active < self.concurrency:
+                return self._admit()
+            if self.waiting >= self.queue:
+                self.shed += 1
+                return False
+            deadline = monotonic() + self.timeout
+            self.waiting += 1
+            try:
+                while self.active >= self.concurrency:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        self.shed += 1
+                        return False
+                    self._cond.wait(remaining)
+                return self._admit()
+            finally:
+                self.waiting -= 1
+
+    def _admit(self):
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        """Give a slot back to the next waiting request."""
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        """Return the limiter's settings and counters."""
+        with self._cond:
+            return {
+                'concurrency': self.concurrency,
+                'queue': self.queue,
+                'active': self.active,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'shed': self.shed
+            }
+
+
+class AdmissionControl(object):
+    """The concurrency limiters of every endpoint class."""
+
+    def __init__(self, limits=None):
+        self.configure(limits)
+
+    def configure(self, limits):
+        """
+        Set the limits of each endpoint class.
+
+        limits maps class names to ConcurrencyLimiter keyword arguments;
+        classes left out are not limited.
+        """
+        self.limiters = {name: ConcurrencyLimiter(**settings)
+                         for name, settings in (limits or {}).items()}
+
+    def limiter(self, endpoint_class):
+        """Return the limiter of endpoint_class, or None."""
+        return self.limiters.get(endpoint_class)
+
+    def stats(self):
+        """Return the counters of every endpoint class."""
+        return {name: limiter.stats()
+                for name, limiter in self.limiters.items()}
+
+
+admission = AdmissionControl()
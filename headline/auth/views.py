@@ -3,14 +3,17 @@ Authentication settings for the BucketList API.
 
 Password verification and user registration takes place here.
 """
-from flask import g, request
+from flask import current_app, g, request
 from flask_cors import cross_origin
 from flask_httpauth import HTTPBasicAuth
 
 from . import authentication
 from headline import errors
-from headline.helpers import email_validation
-from headline.models import User
+from headline.hashing import HashingBusy
+from headline.helpers import (
+    email_validation, json_field, limit_concurrency, rate_limit,
+    remote_address)
+from headline.models import UniqueViolation, User
 from headline.jsend import success
 
 
@@ -25,7 +28,10 @@ def verify_token(token, password):
     Verify token, password doesn't need to be present here. The token is going
     to be in the request headers always.
     """
-    user = User.verify_auth_token(token)
+    if current_app.config['USE_CLAIMS_TOKENS']:
+        user = User.verify_claims_token(token)
+    else:
+        user = User.verify_auth_token(token)
 
     if not user:
         return False
@@ -34,8 +40,23 @@ def verify_token(token, password):
     return True
 
 
+def issue_token(user):
+    """
+    Issue a token for the user.
+
+    Claims tokens are issued when USE_CLAIMS_TOKENS is set.
+    """
+    if current_app.config['USE_CLAIMS_TOKENS']:
+        token = user.generate_claims_token()
+    else:
+        token = user.generate_auth_token()
+    return token.decode('utf-8')
+
+
 @authentication.route('/login', methods=['POST', 'OPTIONS'])
 @cross_origin()
+@rate_limit(10, per=60, scopes=(remote_address, json_field('username')))
+@limit_concurrency('hashing')
 def login():
     """
     Verify username & password
@@ -56,10 +77,19 @@ def login():
     password = _password.strip()
 
     user = User.query.filter_by(username=username).first()
-    if not (user and user.verify_password(password)):
-        return errors.unauthorized("Username and password didn't match.")
-
-    token = user.generate_auth_token().decode('utf-8')
+    try:
+        if not (user and user.verify_password(password)):
+            return errors.unauthorized("Username and password didn't match.")
+
+        # upgrade hashes made with an outdated work factor
+        if user.password_needs_rehash():
+            user.hash_password(password)
+            user.save()
+    except HashingBusy:
+        return errors.service_unavailable("Too many sign in attempts right "
+                                          "now. Please try again.")
+
+    token = issue_token(user)
     response = {
         "token": token,
         "message": "You've been successfully signed in"
@@ -69,6 +99,8 @@ def login():
 
 @authentication.route('/register', methods=['POST', 'OPTIONS'])
 @cross_origin()
+@rate_limit(5, per=60)
+@limit_concurrency('hashing')
 def register_user():
     """
     Create a new user.
@@ -99,14 +131,20 @@ def register_user():
     if not email_validation(_email):
         return errors.bad_request("Please enter a valid email address!")
 
-    if User.query.filter_by(username=username).first():
-        return errors.bad_request("username:{} already exist".format(
-                                 username))
-
     user = User(username=username, email=_email)
-    user.hash_password(password)
-    if user.save():
-        token = user.generate_auth_token().decode('utf-8')
+    try:
+        user.hash_password(password)
+    except HashingBusy:
+        return errors.service_unavailable("Too many sign ups right now. "
+                                          "Please try again.")
+    # a single insert, conflicts on username or email are reported by it
+    try:
+        saved = user.insert()
+    except UniqueViolation as violation:
+        return errors.bad_request(str(violation))
+
+    if saved:
+        token = issue_token(user)
         return success({
             "username": user.username,
             "token": token
@@ -116,6 +154,18 @@ def register_user():
                                   "Please try again.")
 
 
+@authentication.route('/me', methods=['GET', 'OPTIONS'])
+@cross_origin()
+@auth.login_required
+def current_user():
+    """
+    Display the authenticated user.
+
+    Returns the details of the user the token was issued to.
+    """
+    return success(g.user.to_json()), 200
+
+
 @auth.error_handler
 def auth_error():
     """
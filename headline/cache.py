@@ -0,0 +1,82 @@
+"""
+In-process caches for the Headline API.
+
+The caches here live in a single worker process, so entries can be stale in
+other workers for at most their TTL.
+"""
+from collections import OrderedDict
+from time import monotonic
+import threading
+
+
+class TTLCache(object):
+    """
+    A thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    At most `maxsize` entries are kept; the least recently used entry is
+    evicted first. A `maxsize` of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self._lock = threading.Lock()
+        self.configure(maxsize, ttl)
+
+    def configure(self, maxsize, ttl):
+        """Resize the cache, change its TTL and drop every entry."""
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self._entries = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+    def get(self, key):
+        """Return the value cached for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Cache value under key, evicting the least recently used entry."""
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._entries[key] = (value, monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Remove the entry cached under key, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Remove every entry whose key matches predicate."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the size and hit/miss counters of the cache."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
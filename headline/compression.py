@@ -0,0 +1,120 @@
+"""
+Response compression for the Headline API.
+
+Responses at least COMPRESS_MIN_SIZE bytes long, of a type listed in
+COMPRESS_MIMETYPES, are compressed with gzip or deflate, whichever the
+client's Accept-Encoding prefers. Streamed and already encoded bodies are
+sent as they are. A compressed response's ETag gets the coding appended,
+as each coding is a representation of its own. The compressed bytes of
+tagged responses are cached by the hash of the body they were made from,
+so an unchanged resource is compressed once.
+"""
+from time import perf_counter
+import gzip
+import hashlib
+import threading
+import zlib
+
+from flask import request
+
+from .cache import TTLCache
+from .conditional import coded_etag
+
+
+class CompressionStats(object):
+    """Counters of the responses compressed by an app."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.cache_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = 0.0
+
+    def add(self, size, compressed_size, cpu_time=0.0, cached=False):
+        with self._lock:
+            self.responses += 1
+            self.cache_hits += cached
+            self.bytes_in += size
+            self.bytes_out += compressed_size
+            self.cpu_time += cpu_time
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'responses': self.responses,
+                'cache_hits': self.cache_hits,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'ratio': (self.bytes_out / self.bytes_in
+                          if self.bytes_in else 1.0),
+                'cpu_ms': self.cpu_time * 1000
+            }
+
+
+def compress(data, encoding, level=6):
+    """Compress data with the gzip or deflate content coding."""
+    if encoding == 'gzip':
+        return gzip.compress(data, level)
+    # HTTP's deflate is the zlib format
+    return zlib.compress(data, level)
+
+
+def negotiate(accept_encodings):
+    """Return the coding the client prefers, gzip on a tie, or None."""
+    gzip_quality = accept_encodings['gzip']
+    deflate_quality = accept_encodings['deflate']
+    if not (gzip_quality or deflate_quality):
+        return None
+    return 'gzip' if gzip_quality >= deflate_quality else 'deflate'
+
+
+def init_app(app):
+    """Compress the responses of app if COMPRESS is set."""
+    if not app.config.get('COMPRESS'):
+        return
+    config = app.config
+    mimetypes = frozenset(config['COMPRESS_MIMETYPES'])
+    stats = app.extensions['compression'] = CompressionStats()
+    cache = TTLCache(config['COMPRESS_CACHE_SIZE'],
+                     config['COMPRESS_CACHE_TTL'])
+
+    @app.after_request
+    def compress_response(response):
+        if response.status_code < 200 or response.status_code in (204, 304) \
+                or response.direct_passthrough or response.is_streamed or \
+                'Content-Encoding' in response.headers or \
+                response.mimetype not in mimetypes:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+
+        etag, weak = response.get_etag()
+        # the ETag may not follow the body, e.g. a version shared by users
+        key = (hashlib.sha1(data).digest(), encoding) if etag else None
+        compressed = cache.get(key) if key else None
+        if compressed is not None:
+            stats.add(len(data), len(compressed), cached=True)
+        else:
+            start = perf_counter()
+            compressed = compress(data, encoding, config['COMPRESS_LEVEL'])
+            stats.add(len(data), len(compressed), perf_counter() - start)
+            if key:
+                cache.set(key, compressed)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(coded_etag(etag, encoding), weak)
+        return response
+
+
+def compression_stats(app):
+    """Return the compression counters of app."""
+    stats = app.extensions.get('compression')
+    return stats.as_dict() if stats is not None else {}
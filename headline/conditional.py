@@ -0,0 +1,111 @@
+"""
+Conditional GET support for the Headline API.
+
+Successful JSON GET responses, those of jsend.success and the json and
+paginate helpers included, carry a strong ETag and a Cache-Control header,
+and a request whose If-None-Match names the current ETag gets an empty
+304. ETags are content hashes by default. Routes wrapped in conditional()
+derive theirs from a cheap version of the data instead, so an unchanged
+resource is answered before it is queried or serialized. As that version
+says nothing of who is asking, the caller's Authorization header goes into
+those ETags too and the responses vary on it.
+"""
+import functools
+import hashlib
+
+from flask import current_app, make_response, request
+
+
+def _cacheable(response):
+    return request.method in ('GET', 'HEAD') and \
+        response.status_code in (200, 304) and not response.is_streamed
+
+
+def _set_cache_control(response, default=None):
+    if 'Cache-Control' in response.headers:
+        return
+    config = current_app.config
+    value = config['CACHE_CONTROL'].get(
+        request.endpoint, default or config['CACHE_CONTROL_DEFAULT'])
+    if value:
+        response.headers['Cache-Control'] = value
+
+
+# content codings whose representations get ETags of their own
+CODINGS = ('gzip', 'deflate')
+
+
+def coded_etag(etag, coding):
+    """Return the ETag of etag's representation in a content coding."""
+    return '{}-{}'.format(etag, coding)
+
+
+def _held_etag(etag):
+    """Return the ETag of the representation of etag the client has."""
+    if etag in request.if_none_match:
+        return etag
+    for coding in CODINGS:
+        if coded_etag(etag, coding) in request.if_none_match:
+            return coded_etag(etag, coding)
+    return None
+
+
+def make_conditional(response, etag=None, cache_control=None):
+    """
+    Tag a GET response with a strong ETag and answer If-None-Match.
+
+    Without etag, the hash of the body is used. Returns the response,
+    turned into a 304 when the client already has it.
+    """
+    if not _cacheable(response):
+        return response
+    if etag is None:
+        etag = hashlib.sha1(response.get_data()).hexdigest()
+    # a 304 names the representation the client holds, compressed or not
+    response.set_etag(_held_etag(etag) or etag)
+    _set_cache_control(response, cache_control)
+    return response.make_conditional(request)
+
+
+def conditional(version, cache_control=None):
+    """
+    Answer unchanged GET requests before the view runs.
+
+    `version` is called with the view's arguments and returns a value that
+    changes whenever the response would, such as Base.version(). The ETag
+    is derived from it, the request's URL and its Authorization header, so
+    routes answering per user never hand one user's ETag to another.
+    `cache_control` is the route's Cache-Control unless CACHE_CONTROL
+    overrides it.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapped(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+            etag = hashlib.sha1('{} {} {}'.format(
+                request.full_path, request.headers.get('Authorization', ''),
+                version(*args, **kwargs)).encode('utf-8')).hexdigest()
+            held = _held_etag(etag)
+            if held is not None:
+                response = current_app.response_class(status=304)
+                response.set_etag(held)
+                _set_cache_control(response, cache_control)
+            else:
+                response = make_conditional(
+                    make_response(f(*args, **kwargs)), etag, cache_control)
+            response.vary.add('Authorization')
+            return response
+        return wrapped
+    return decorator
+
+
+def init_app(app):
+    """Tag the JSON responses of app with content ETags."""
+
+    @app.after_request
+    def tag_response(response):
+        if response.mimetype == app.config['JSONIFY_MIMETYPE'] and \
+                'ETag' not in response.headers:
+            return make_conditional(response)
+        return response
@@ -0,0 +1,119 @@
+"""
+JSON response encoding for the Headline API.
+
+Responses are encoded with orjson or python-rapidjson when one of them is
+installed, and with Flask's encoder otherwise; JSON_ENGINE picks one
+explicitly. Output is compact unless JSONIFY_PRETTYPRINT_REGULAR is set,
+in which case Flask's encoder indents it. Values the fast engines can't
+encode, such as dates, go through the app's JSON encoder like they would
+with flask.jsonify.
+"""
+from flask import current_app, json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import rapidjson
+except ImportError:  # pragma: no cover
+    rapidjson = None
+
+
+def _stdlib_encode(obj, sort_keys):
+    return json.dumps(obj, sort_keys=sort_keys,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def _stdlib_engine(app):
+    return _stdlib_encode
+
+
+def _orjson_engine(app):
+    default = app.json_encoder().default
+    base = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def encode(obj, sort_keys):
+        option = base | orjson.OPT_SORT_KEYS if sort_keys else base
+        return orjson.dumps(obj, default=default, option=option)
+    return encode
+
+
+def _rapidjson_engine(app):
+    default = app.json_encoder().default
+
+    def encode(obj, sort_keys):
+        return rapidjson.dumps(obj, default=default,
+                               sort_keys=sort_keys).encode('utf-8')
+    return encode
+
+
+ENGINES = {
+    'orjson': _orjson_engine if orjson is not None else None,
+    'rapidjson': _rapidjson_engine if rapidjson is not None else None,
+    'stdlib': _stdlib_engine
+}
+
+
+def configure(app):
+    """Pick the JSON engine of app according to JSON_ENGINE."""
+    name = app.config.get('JSON_ENGINE', 'auto')
+    if name == 'auto':
+        name = next(name for name in ('orjson', 'rapidjson', 'stdlib')
+                    if ENGINES[name] is not None)
+    elif ENGINES.get(name) is None:
+        raise ValueError('JSON engine {} is not available'.format(name))
+    app.extensions['json_engine'] = (name, ENGINES[name](app))
+
+
+def pretty():
+    """Tell whether responses of the current app are indented."""
+    return bool(current_app.config['JSONIFY_PRETTYPRINT_REGULAR'])
+
+
+def dumpb(obj, indent=None):
+    """Encode obj to JSON bytes with the current app's engine."""
+    if indent is not None:
+        return (json.dumps(obj, indent=indent, separators=(',', ': ')) +
+                '\n').encode('utf-8')
+    encode = current_app.extensions['json_engine'][1]
+    sort_keys = current_app.config['JSON_SORT_KEYS']
+    try:
+        return encode(obj, sort_keys)
+    except (TypeError, OverflowError):
+        # what the fast engines refuse, e.g. integers wider than 64 bits
+        return _stdlib_encode(obj, sort_keys)
+
+
+def dumps(obj):
+    """Encode obj to a compact JSON string with the current app's engine."""
+    return dumpb(obj).decode('utf-8')
+
+
+def jsonify(*args, **kwargs):
+    """Like flask.jsonify, with the current app's engine."""
+    data = args[0] if len(args) == 1 and not kwargs else dict(*args,
+                                                              **kwargs)
+    body = dumpb(data, indent=2 if pretty() else None)
+    return current_app.response_class(
+        body, mimetype=current_app.config['JSONIFY_MIMETYPE'])
+
+
+class PreEncoded(object):
+    """A constant JSON response, encoded once per output format."""
+
+    def __init__(self, data, status=200):
+        self.data = data
+        self.status = status
+        self._bodies = {}
+
+    def response(self):
+        """Return a new response carrying the encoded body."""
+        indent = 2 if pretty() else None
+        body = self._bodies.get(indent)
+        if body is None:
+            body = self._bodies[indent] = dumpb(self.data, indent)
+        return current_app.response_class(
+            body, status=self.status,
+            mimetype=current_app.config['JSONIFY_MIMETYPE'])
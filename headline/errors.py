@@ -3,8 +3,28 @@ This script contains the routes for the error handlers.
 
 This installs application-wide error handlers
 """
-from flask import jsonify
-from .jsend import error
+from functools import lru_cache
+
+from .encoding import PreEncoded
+
+
+@lru_cache(maxsize=256)
+def _envelope(status, error, message, jsend=True):
+    # error bodies repeat the same few messages; encode each one once
+    data = {'status': status, 'error': error, 'message': message}
+    if jsend:
+        data = {'status': 'error', 'details': data}
+    return PreEncoded(data, status)
+
+
+def error_response(status, error, message, jsend=True):
+    """Return the response of an error, encoded once per message."""
+    try:
+        envelope = _envelope(status, error, message, jsend)
+    except TypeError:
+        # an unhashable message, encoded every time
+        envelope = _envelope.__wrapped__(status, error, message, jsend)
+    return envelope.response()
 
 
 def not_found(message="The specified resource cannot be found."):
@@ -13,14 +33,7 @@ def not_found(message="The specified resource cannot be found."):
     
     This returns a json object with a description of the error type.
     """
-
-    response = {
-        'status': 404,
-        'error': 'Resource not found',
-        'message': message
-    }
-    response.status_code = 404
-    return response
+    return error_response(404, 'Resource not found', message), 404
 
 
 def bad_request(message):
@@ -29,12 +42,7 @@ def bad_request(message):
 
     This returns a json object with a description of the error type.
     """
-    response = {
-        'status': 400,
-        'error': "Bad Request",
-        'message': message
-    }
-    return error(response), 400
+    return error_response(400, "Bad Request", message), 400
 
 
 def unauthorized(message):
@@ -43,12 +51,7 @@ def unauthorized(message):
 
     This returns a json object with a description of the error type.
     """
-    response = {
-        'status': 401,
-        'error': "Unauthorized",
-        'message': message
-    }
-    return error(response), 401
+    return error_response(401, "Unauthorized", message), 401
 
 
 def token_error(message):
@@ -57,10 +60,26 @@ def token_error(message):
 
     THis returns a json object describing the token error.
     """
-    response = jsonify({
-        'status': 401,
-        'error': "Token Error",
-        'message': message
-    })
-    response.status_code = 401
-    return response
+    return error_response(401, "Token Error", message, jsend=False)
+
+
+def too_many_requests(message, retry_after):
+    """
+    The handler handles the 429 (Too Many Requests) error.
+
+    This returns a json object with a description of the error type and
+    tells the client when to retry.
+    """
+    return (error_response(429, "Too Many Requests", message), 429,
+            {'Retry-After': str(retry_after)})
+
+
+def service_unavailable(message, retry_after=1):
+    """
+    The handler handles the 503 (Service Unavailable) error.
+
+    This returns a json object with a description of the error type and
+    tells the client when to retry.
+    """
+    return (error_response(503, "Service Unavailable", message), 503,
+            {'Retry-After': str(retry_after)})
@@ -0,0 +1,108 @@
+"""
+Password hashing for the Headline API.
+
+Key derivation is CPU bound, so it can run on a bounded process pool instead
+of the request thread. Requests wait at most PASSWORD_HASH_TIMEOUT seconds
+for a slot and a result before HashingBusy is raised. A pool broken by a
+dead process is replaced, and the job tried once more.
+
+The request still waits for its hash, so the pool doesn't make logins
+faster; it keeps the GIL free for the worker's other threads. That only
+pays off with threaded workers. A sync worker is blocked either way, so
+hash inline there.
+"""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import os
+import threading
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool can't take or finish work in time."""
+
+
+class PasswordHasher(object):
+    """
+    Hash and check passwords inline or on a bounded process pool.
+
+    With `workers` set to 0 the work runs in the calling thread. Otherwise
+    at most `workers + queue_size` jobs are accepted at once; callers wait
+    up to `timeout` seconds for a slot and again for the result.
+    """
+
+    def __init__(self, method='pbkdf2:sha256:50000', workers=0, queue_size=0,
+                 timeout=5):
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.configure(method, workers, queue_size, timeout)
+
+    def configure(self, method, workers, queue_size, timeout):
+        """Change the work factor and pool size, shutting down the old pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size or 1)
+        self._pool = None
+        self._pid = None
+
+    def hash(self, password):
+        """Return a salted hash of password using the configured method."""
+        return self._run(generate_password_hash, password, self.method)
+
+    def check(self, pwhash, password):
+        """Return True if password matches pwhash."""
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Return True if pwhash wasn't made with the configured method."""
+        return pwhash.split('$', 1)[0] != self.method
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        for attempt in (1, 2):
+            pool = self._get_pool()
+            try:
+                return self._submit(pool, func, args).result(
+                    timeout=self.timeout)
+            except TimeoutError:
+                raise HashingBusy('Password hashing took too long.')
+            except BrokenProcessPool:
+                # a hashing process died, e.g. killed for memory, which
+                # breaks its pool for good; retry once on a new one
+                self._discard(pool)
+        raise HashingBusy('Password hashing workers failed.')
+
+    def _submit(self, pool, func, args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingBusy('No password hashing worker became available.')
+        try:
+            future = pool.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _get_pool(self):
+        # pools don't survive a fork, each gunicorn worker starts its own
+        with self._pool_lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def _discard(self, pool):
+        """Drop a broken pool so the next job starts a new one."""
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+
+# Configured from the PASSWORD_HASH_* settings in create_app.
+password_hasher = PasswordHasher()
@@ -4,15 +4,22 @@ Define helper functions for the application.
 All decorators to be used in the application are defined here.
 """
 
+import base64
 import functools
 import re
 
-from flask import jsonify, wrappers, request, url_for, current_app
+from flask import abort, wrappers, request, url_for, current_app
+from flask_sqlalchemy import Pagination
+
+from . import errors
+from .admission import admission
+from .encoding import jsonify
+from .rate_limit import rate_limiter
 
 
 def json(f):
     """
-    Modify result of passed in function to return pretty printed JSON.
+    Modify result of passed in function to return JSON.
     
     Courtesy - Miguel Grinberg
     """
@@ -46,63 +53,231 @@ def to_camel_case(snake_str):
     return title_str[0].lower() + title_str[1:]
 
 
-def paginate():
+def paginate(collection='items', cursor=False, with_total=None):
     """
     Generate a paginated response for a resource collection.
 
     Routes that use this decorator must return a SQLAlchemy query as a
     response.
-    The output of this decorator is a Python dictionary with the paginated
-    results. The application must ensure that this result is converted to a
-    response object, either by chaining another decorator or by using a
-    custom response object that accepts dictionaries.
+    The output of this decorator is a JSON response with the paginated
+    results under `collection` and the pagination details under `meta`.
+
+    By default pages are numbered and fetched with OFFSET. With `cursor`
+    set, pages are fetched by keyset on the time-ordered primary key and
+    linked by opaque `next`/`prev` cursors, so every page costs the same.
+    `with_total` adds the total count; it defaults to on for numbered pages
+    and off for cursor pages. Totals come from the model's count cache, or
+    from Postgres' planner estimate for tables past
+    COUNT_ESTIMATE_THRESHOLD rows, with `meta.exact` telling which.
     Courtesy - Miguel Grinberg
     """
+    if with_total is None:
+        with_total = not cursor
+
     def decorator(f):
         @functools.wraps(f)
         def wrapped(*args, **kwargs):
-            # get the number of the page to be displayed from URL
-            page = request.args.get('page', 1, type=int)
-
             # get the number of items to be displayed per page
-            limit = min(request.args.get(
+            limit = max(1, min(request.args.get(
                 'limit', current_app.config['DEFAULT_PER_PAGE'], type=int),
-                current_app.config['MAX_PER_PAGE'])
+                current_app.config['MAX_PER_PAGE']))
 
-            # get query, paginate the query and get content of query
             query = f(*args, **kwargs)
-            pagination = query.paginate(page, limit)
-            content = pagination.items
-
-            # prepare the meta portion of the json response
-            pages = {'page': page, 'limit': limit,
-                     'total': pagination.total, 'pages': pagination.pages}
-            if pagination.has_prev:
-                pages['prev'] = url_for(request.endpoint,
-                                        page=pagination.prev_num, limit=limit,
-                                        _external=True, **kwargs)
-            else:
-                pages['prev'] = None
-
-            if pagination.has_next:
-                pages['next'] = url_for(request.endpoint,
-                                        page=pagination.next_num, limit=limit,
-                                        _external=True, **kwargs)
+            if cursor:
+                content, pages = _keyset_page(query, limit, with_total,
+                                              kwargs)
             else:
-                pages['next'] = None
-
-            pages['first'] = url_for(request.endpoint, page=1,
-                                     limit=limit, _external=True,
-                                     **kwargs)
-            pages['last'] = url_for(request.endpoint, pages=pagination.pages,
-                                    limit=limit, _external=True,
-                                    **kwargs)
+                content, pages = _offset_page(query, limit, with_total,
+                                              kwargs)
             return jsonify({
                 'meta': pages,
-                'bucketlists': [each.to_json() for each in content]
+                collection: [each.to_json() for each in content]
             })
         return wrapped
-        return decorator
+    return decorator
+
+
+def _offset_page(query, limit, with_total, kwargs):
+    # get the number of the page to be displayed from URL
+    page = request.args.get('page', 1, type=int)
+
+    # paginate the query and get content of query
+    pages = {'page': page, 'limit': limit}
+    if page < 1:
+        abort(404)
+    if with_total:
+        total, pages['exact'] = _total(query)
+        content = query.limit(limit).offset((page - 1) * limit).all()
+        pagination = Pagination(query, page, limit, total, content)
+        pages['total'] = pagination.total
+        pages['pages'] = pagination.pages
+        has_prev, has_next = pagination.has_prev, pagination.has_next
+    else:
+        # fetch one extra row to find out whether there's a next page
+        content = query.limit(limit + 1).offset((page - 1) * limit).all()
+        has_prev, has_next = page > 1, len(content) > limit
+        content = content[:limit]
+
+    # prepare the meta portion of the json response
+    if has_prev:
+        pages['prev'] = url_for(request.endpoint,
+                                page=page - 1, limit=limit,
+                                _external=True, **kwargs)
+    else:
+        pages['prev'] = None
+
+    if has_next:
+        pages['next'] = url_for(request.endpoint,
+                                page=page + 1, limit=limit,
+                                _external=True, **kwargs)
+    else:
+        pages['next'] = None
+
+    pages['first'] = url_for(request.endpoint, page=1,
+                             limit=limit, _external=True,
+                             **kwargs)
+    if with_total:
+        pages['last'] = url_for(request.endpoint, page=pagination.pages,
+                                limit=limit, _external=True,
+                                **kwargs)
+    return content, pages
+
+
+def _keyset_page(query, limit, with_total, kwargs):
+    key = query.column_descriptions[0]['entity'].id
+    direction, position = decode_cursor(request.args.get('cursor'))
+
+    page = query.order_by(None)
+    if direction == '<':
+        # walk backwards from the cursor, then restore ascending order
+        page = page.filter(key < position).order_by(key.desc())
+    else:
+        if position is not None:
+            page = page.filter(key > position)
+        page = page.order_by(key)
+    content = page.limit(limit + 1).all()
+    has_more = len(content) > limit
+    content = content[:limit]
+    if direction == '<':
+        content.reverse()
+
+    has_next = has_more if direction != '<' else True
+    has_prev = has_more if direction == '<' else position is not None
+    pages = {'limit': limit}
+    if with_total:
+        pages['total'], pages['exact'] = _total(query)
+    pages['next'] = url_for(
+        request.endpoint, cursor=encode_cursor('>', content[-1].id),
+        limit=limit, _external=True, **kwargs) \
+        if has_next and content else None
+    pages['prev'] = url_for(
+        request.endpoint, cursor=encode_cursor('<', content[0].id),
+        limit=limit, _external=True, **kwargs) \
+        if has_prev and content else None
+    pages['first'] = url_for(request.endpoint, limit=limit, _external=True,
+                             **kwargs)
+    return content, pages
+
+
+def _total(query):
+    # cached exact counts, or planner estimates for large Postgres tables
+    model = query.column_descriptions[0]['entity']
+    return model.count_total(
+        query, current_app.config['COUNT_ESTIMATE_THRESHOLD'])
+
+
+def encode_cursor(direction, position):
+    """Encode a page position as an opaque cursor."""
+    return base64.urlsafe_b64encode(
+        (direction + position).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor into its direction ('>' or '<') and position.
+
+    Missing or malformed cursors point at the first page.
+    """
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode('ascii')).decode(
+            'utf-8')
+    except (AttributeError, ValueError, UnicodeError):
+        return '>', None
+    if value[:1] not in ('>', '<') or len(value) < 2:
+        return '>', None
+    return value[0], value[1:]
+
+
+def remote_address():
+    """Scope rate limits to the client's IP address."""
+    return 'ip:{}'.format(request.remote_addr)
+
+
+def json_field(name):
+    """Scope rate limits to a field of the JSON body, such as a username."""
+    def scope():
+        body = request.get_json(silent=True)
+        value = body.get(name) if isinstance(body, dict) else None
+        if not isinstance(value, str) or not value.strip():
+            return None
+        return '{}:{}'.format(name, value.strip())
+    return scope
+
+
+def rate_limit(limit, per=60, scopes=(remote_address,)):
+    """
+    Limit how often a route can be called.
+
+    Every scope (client IP by default) may call the route at most `limit`
+    times per `per` seconds over a sliding window. Callers over a limit get
+    a 429 response before the route does any work. Disabled when
+    USE_RATE_LIMITS is off.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapped(*args, **kwargs):
+            if current_app.config['USE_RATE_LIMITS']:
+                retry_after = None
+                for scope in scopes:
+                    key = scope()
+                    if key is None:
+                        continue
+                    retry = rate_limiter.hit(
+                        '{}/{}'.format(f.__name__, key), limit, per)
+                    if retry is not None:
+                        retry_after = max(retry, retry_after or 0)
+                if retry_after is not None:
+                    return errors.too_many_requests(
+                        "You have exceeded your request rate.", retry_after)
+            return f(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def limit_concurrency(endpoint_class):
+    """
+    Limit how many requests of a route run at once.
+
+    The route shares the limits configured for endpoint_class in
+    ADMISSION_LIMITS. Requests that find no free slot and no room in the
+    wait queue, or wait past the deadline, get a 503 right away.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapped(*args, **kwargs):
+            limiter = admission.limiter(endpoint_class)
+            if limiter is None:
+                return f(*args, **kwargs)
+            if not limiter.acquire():
+                return errors.service_unavailable(
+                    "The server is busy right now. Please try again.",
+                    limiter.retry_after)
+            try:
+                return f(*args, **kwargs)
+            finally:
+                limiter.release()
+        return wrapped
+    return decorator
 
 
 def email_validation(email_address):
@@ -0,0 +1,185 @@
+"""
+Bulk import of users.
+
+Users are streamed from a CSV or JSON lines file and written in chunks, each
+chunk in its own transaction. After every committed chunk the number of
+input rows done is written to a checkpoint file, so a failed import resumes
+from the last committed chunk when run again. The checkpoint also marks the
+chunk being written, and a rerun skips those of its rows that are already
+in the database, in case the import died between the commit and the
+checkpoint.
+"""
+from itertools import islice
+from multiprocessing import Pool
+from time import perf_counter
+import csv
+import json
+import os
+
+from werkzeug.security import generate_password_hash
+import sqlalchemy
+
+from . import db
+from .hashing import password_hasher
+from .models import User, push_id
+
+
+class ImportFailed(Exception):
+    """Raised when a chunk of users can't be imported."""
+
+
+def read_rows(path):
+    """Yield the users in a .csv or .jsonl file as dictionaries."""
+    with open(path, newline='') as source:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(source):
+                yield row
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _hash_password(args):
+    password, method = args
+    if not password:
+        return None
+    return generate_password_hash(password, method)
+
+
+def _read_checkpoint(checkpoint):
+    """Return the rows done and the end of the chunk being written."""
+    try:
+        with open(checkpoint) as state:
+            fields = [int(field) for field in state.read().split()] or [0]
+    except FileNotFoundError:
+        fields = [0]
+    return fields[0], fields[-1]
+
+
+def _write_checkpoint(checkpoint, done, writing=None):
+    with open(checkpoint + '.tmp', 'w') as state:
+        state.write(str(done) if writing is None else
+                    '{} {}'.format(done, writing))
+    os.replace(checkpoint + '.tmp', checkpoint)
+
+
+def _read_chunk(rows, size, first):
+    """Return the next size rows, the first of them row number first."""
+    chunk = list(islice(rows, size))
+    for number, row in enumerate(chunk, first):
+        if not isinstance(row, dict) or not row.get('username') or \
+                not row.get('email') or not (row.get('password') or
+                                             row.get('password_hash')):
+            raise ImportFailed(
+                'Row {}: a username, an email and a password or '
+                'password_hash are required. Fix the input and run again '
+                'to resume.'.format(number))
+    return chunk
+
+
+def _skip_written(chunk, count):
+    """Drop the rows among the first count of chunk already imported."""
+    names = [row['username'].strip() for row in chunk[:count]]
+    # a replica may not have the rows of the run that died yet
+    db.session.info['primary'] = True
+    written = set(db.session.query(User.username, User.email).filter(
+        User.username.in_(names)))
+    return [row for index, row in enumerate(chunk) if index >= count or
+            (row['username'].strip(), row['email'].strip()) not in written]
+
+
+def _build_rows(chunk, hashes):
+    ids = push_id.next_ids(len(chunk))
+    rows = []
+    for row, pwhash, user_id in zip(chunk, hashes, ids):
+        rows.append({
+            'id': user_id,
+            'username': row['username'].strip(),
+            'email': row['email'].strip(),
+            'password': pwhash or row['password_hash'],
+            'isVerified': str(row.get('isVerified', '')).lower() in (
+                '1', 'true', 'yes'),
+            'token_version': 0
+        })
+    return rows
+
+
+def import_users(path, chunk_size=1000, workers=None, checkpoint=None,
+                 report=print):
+    """
+    Import the users in path and return the number of rows imported.
+
+    Rows need a username, an email and either a plain text `password`,
+    hashed on `workers` processes (all cores by default, 0 hashes inline)
+    while the previous chunk is written, or an existing werkzeug
+    `password_hash`.
+    """
+    checkpoint = checkpoint or path + '.checkpoint'
+    done, writing = _read_checkpoint(checkpoint)
+    if done:
+        report('Resuming after row {}'.format(done))
+
+    pool = Pool(workers) if workers != 0 else None
+    method = password_hasher.method
+
+    def start_hashing(chunk):
+        passwords = [(row.get('password'), method) for row in chunk]
+        if pool is None:
+            return [_hash_password(args) for args in passwords]
+        return pool.map_async(_hash_password, passwords)
+
+    rows = islice(read_rows(path), done, None)
+    imported = 0
+    failed = None
+    start = perf_counter()
+    try:
+        chunk = _read_chunk(rows, chunk_size, done + 1)
+        size = len(chunk)
+        if writing > done:
+            chunk = _skip_written(chunk, writing - done)
+        hashes = start_hashing(chunk)
+        while size:
+            hashes = hashes if pool is None else hashes.get()
+            values = _build_rows(chunk, hashes)
+
+            # hash the next chunk while this one is written; a bad row in
+            # it fails the import once this one is committed
+            try:
+                next_chunk = _read_chunk(rows, chunk_size, done + size + 1)
+            except ImportFailed as error:
+                next_chunk, failed = [], error
+            next_hashes = start_hashing(next_chunk)
+
+            _write_checkpoint(checkpoint, done, done + size)
+            try:
+                if values:
+                    db.session.execute(User.__table__.insert(), values)
+                db.session.commit()
+            except sqlalchemy.exc.IntegrityError as error:
+                db.session.rollback()
+                # nothing of the chunk was written, so a rerun mustn't skip
+                # its rows as if they had been
+                _write_checkpoint(checkpoint, done)
+                raise ImportFailed(
+                    'Rows {}-{}: duplicate {}. Fix the input and run again '
+                    'to resume.'.format(done + 1, done + size,
+                                        User.violated_column(error)))
+            User.invalidate_counts()
+            done += size
+            imported += len(values)
+            _write_checkpoint(checkpoint, done)
+            report('{} rows imported, {:.0f} rows/sec'.format(
+                done, imported / (perf_counter() - start)))
+            if failed is not None:
+                raise failed
+            chunk, hashes = next_chunk, next_hashes
+            size = len(chunk)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return imported
@@ -1,5 +1,7 @@
 """This aims to jsendify all responses coming from the API."""
-from flask import jsonify
+from flask import Response, stream_with_context
+
+from .encoding import dumps, jsonify
 
 
 def success(data):
@@ -12,6 +14,32 @@ def success(data):
     return jsonify(response)
 
 
+def stream_success(items, chunk_size=100):
+    """
+    Streamed response for a successful API call listing many items.
+
+    The envelope is sent as the items are produced, `chunk_size` items at a
+    time, so a large listing is never held in memory.
+    """
+
+    def generate():
+        yield '{"status": "success", "data": ['
+        separator = ''
+        chunk = []
+        for item in items:
+            chunk.append(dumps(item))
+            if len(chunk) == chunk_size:
+                yield separator + ','.join(chunk)
+                separator = ','
+                chunk = []
+        if chunk:
+            yield separator + ','.join(chunk)
+        yield ']}'
+
+    return Response(stream_with_context(generate()),
+                    mimetype='application/json')
+
+
 def failure(message):
     """Response for a failed API call or whatever."""
 
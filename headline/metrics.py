@@ -0,0 +1,320 @@
+"""
+Request metrics for the Headline API.
+
+Every request is counted by endpoint and status, its latency goes into a
+histogram and its DB time into a counter, and requests in flight and the
+requests shed by admission control are tracked. Recording is a few
+dictionary updates under a lock, in memory.
+
+With METRICS_DIR set, each worker process writes its numbers to a file of
+its own there, at most every METRICS_FLUSH_INTERVAL seconds, and /metrics
+adds up the files of all workers; without it, /metrics reports the
+serving process only. The files of workers that exited are folded into a
+single one. The output is in the Prometheus text format.
+"""
+from bisect import bisect_left
+from time import monotonic, perf_counter
+import binascii
+import fcntl
+import json
+import os
+import tempfile
+import threading
+
+from flask import g, request
+
+from . import profiling
+from .admission import admission
+
+
+class Series(object):
+    """The latency histogram and DB time of one endpoint."""
+
+    __slots__ = ('buckets', 'sum', 'count', 'db_time')
+
+    def __init__(self, size):
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.count = 0
+        self.db_time = 0.0
+
+
+class Metrics(object):
+    """The metrics of the requests served by a worker process."""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop every number, e.g. those inherited by a forked worker."""
+        with self._lock:
+            self.pid = os.getpid()
+            # tells this process's file from that of an exited worker which
+            # had the same pid
+            self.nonce = binascii.hexlify(os.urandom(4)).decode('ascii')
+            self.series = {}
+            self.statuses = {}
+            self.in_flight = 0
+
+    def started(self):
+        if self.pid != os.getpid():
+            self.reset()
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, endpoint, status, seconds, db_time):
+        index = bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.in_flight -= 1
+            series = self.series.get(endpoint)
+            if series is None:
+                # one bucket per bound and one past the last, for +Inf
+                series = self.series[endpoint] = Series(len(self.bounds) + 1)
+            series.buckets[index] += 1
+            series.sum += seconds
+            series.count += 1
+            series.db_time += db_time
+            key = (endpoint, status)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def snapshot(self):
+        """Return the numbers as a JSON-serializable dictionary."""
+        with self._lock:
+            return {
+                'pid': self.pid,
+                'nonce': self.nonce,
+                'bounds': self.bounds,
+                'in_flight': self.in_flight,
+                'series': {endpoint: [series.buckets, series.sum,
+                                      series.count, series.db_time]
+                           for endpoint, series in self.series.items()},
+                'statuses': [[endpoint, status, count] for
+                             (endpoint, status), count in
+                             self.statuses.items()],
+                'shed': {name: limiter.shed
+                         for name, limiter in admission.limiters.items()}
+            }
+
+
+class FileStore(object):
+    """
+    Share the snapshots of worker processes through a directory.
+
+    Each process writes a file named after its pid and startup nonce. The
+    files of exited workers are added up into RETIRED, which lists the
+    files folded into it until they are gone, so none is counted twice.
+    """
+
+    RETIRED = 'metrics-retired.json'
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, snapshot, name=None):
+        handle, path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as output:
+            json.dump(snapshot, output)
+        # readers see either the old file or the new one, never half of one
+        os.replace(path, os.path.join(self.directory, name or
+                                      'metrics-{}-{}.json'.format(
+                                          snapshot['pid'], snapshot['nonce'])))
+
+    def _load(self):
+        snapshots = {}
+        for name in os.listdir(self.directory):
+            if name.startswith('metrics-') and name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.directory, name)) as source:
+                        snapshots[name] = json.load(source)
+                except (OSError, ValueError):
+                    continue
+        return snapshots
+
+    def read_all(self):
+        self.retire()
+        snapshots = self._load()
+        retired = snapshots.get(self.RETIRED)
+        folded = set(retired['folded']) if retired else set()
+        return [snapshot for name, snapshot in snapshots.items()
+                if name not in folded]
+
+    def retire(self):
+        """Fold the files of workers that exited into RETIRED."""
+        with open(os.path.join(self.directory, 'metrics.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            snapshots = self._load()
+            retired = snapshots.pop(self.RETIRED, None)
+            folded = set(retired['folded']) if retired else set()
+            exited = {name: snapshot for name, snapshot in snapshots.items()
+                      if name not in folded and not _alive(snapshot['pid'])}
+            if exited:
+                merged = merge(([retired] if retired else []) +
+                               list(exited.values()))
+                self.write({
+                    'pid': None,
+                    'bounds': merged.get('bounds', ()),
+                    'in_flight': 0,
+                    'series': merged['series'],
+                    'statuses': [[endpoint, status, count] for
+                                 (endpoint, status), count in
+                                 merged['statuses'].items()],
+                    'shed': merged['shed'],
+                    'folded': sorted(set(exited) | {
+                        name for name in folded if name in snapshots})
+                }, self.RETIRED)
+            for name in folded | set(exited):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+
+def _alive(pid):
+    if pid is None:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge(snapshots):
+    """
+    Add up the snapshots of several workers.
+
+    Counters of workers that exited are kept, so they never go backwards;
+    only their requests in flight are dropped.
+    """
+    merged = {'in_flight': 0, 'series': {}, 'statuses': {}, 'shed': {}}
+    for snapshot in snapshots:
+        if _alive(snapshot['pid']):
+            merged['in_flight'] += snapshot['in_flight']
+        merged['bounds'] = snapshot['bounds']
+        for endpoint, (buckets, total, count, db_time) in \
+                snapshot['series'].items():
+            series = merged['series'].get(endpoint)
+            if series is None:
+                merged['series'][endpoint] = [list(buckets), total, count,
+                                              db_time]
+                continue
+            series[0] = [a + b for a, b in zip(series[0], buckets)]
+            series[1] += total
+            series[2] += count
+            series[3] += db_time
+        for endpoint, status, count in snapshot['statuses']:
+            key = (endpoint, status)
+            merged['statuses'][key] = merged['statuses'].get(key, 0) + count
+        for name, count in snapshot.get('shed', {}).items():
+            merged['shed'][name] = merged['shed'].get(name, 0) + count
+    return merged
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def render(merged):
+    """Render merged snapshots in the Prometheus text format."""
+    lines = ['# TYPE headline_requests_in_flight gauge',
+             'headline_requests_in_flight {}'.format(merged['in_flight']),
+             '# TYPE headline_requests_total counter']
+    for (endpoint, status), count in sorted(merged['statuses'].items()):
+        lines.append('headline_requests_total{{endpoint="{}",status="{}"}} '
+                     '{}'.format(_label(endpoint), status, count))
+    lines.append('# TYPE headline_requests_shed_total counter')
+    for name, count in sorted(merged['shed'].items()):
+        lines.append('headline_requests_shed_total{{endpoint_class="{}"}} '
+                     '{}'.format(_label(name), count))
+    lines.append('# TYPE headline_request_duration_seconds histogram')
+    bounds = [repr(float(bound)) for bound in merged.get('bounds', ())]
+    for endpoint, (buckets, total, count, _) in \
+            sorted(merged['series'].items()):
+        label = _label(endpoint)
+        cumulative = 0
+        for bound, bucket in zip(bounds + ['+Inf'], buckets):
+            cumulative += bucket
+            lines.append('headline_request_duration_seconds_bucket'
+                         '{{endpoint="{}",le="{}"}} {}'.format(
+                             label, bound, cumulative))
+        lines.append('headline_request_duration_seconds_sum'
+                     '{{endpoint="{}"}} {!r}'.format(label, total))
+        lines.append('headline_request_duration_seconds_count'
+                     '{{endpoint="{}"}} {}'.format(label, count))
+    lines.append('# TYPE headline_db_seconds_total counter')
+    for endpoint, (_, _, _, db_time) in sorted(merged['series'].items()):
+        lines.append('headline_db_seconds_total{{endpoint="{}"}} {!r}'.format(
+            _label(endpoint), db_time))
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Record the metrics of app's requests if METRICS is set."""
+    if not app.config.get('METRICS'):
+        return
+    metrics = app.extensions['metrics'] = Metrics(
+        app.config['METRICS_BUCKETS'])
+    stores = {}
+    flushed = [0.0]
+    profiling.track_statements()
+
+    def get_store():
+        directory = app.config.get('METRICS_DIR')
+        if not directory:
+            return None
+        if directory not in stores:
+            stores[directory] = FileStore(directory)
+        return stores[directory]
+
+    def flush(store, force=False):
+        now = monotonic()
+        if force or now - flushed[0] >= app.config['METRICS_FLUSH_INTERVAL']:
+            flushed[0] = now
+            store.write(metrics.snapshot())
+
+    def finish(status):
+        g.metrics_done = True
+        metrics.finished(request.endpoint or 'unmatched', status,
+                         perf_counter() - g.metrics_start, g.db_time)
+        store = get_store()
+        if store is not None:
+            flush(store)
+
+    @app.before_request
+    def start_request():
+        metrics.started()
+        g.metrics_start = perf_counter()
+        g.metrics_done = False
+        g.db_time = 0.0
+
+    @app.after_request
+    def record_response(response):
+        if 'metrics_start' in g and not g.metrics_done:
+            finish(response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_error(error=None):
+        # an unhandled exception skips after_request; count it as a 500
+        if 'metrics_start' in g and not g.metrics_done:
+            finish(500)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        """Serve the metrics of every worker in the Prometheus format."""
+        store = get_store()
+        if store is None:
+            merged = merge([metrics.snapshot()])
+        else:
+            flush(store, force=True)
+            merged = merge(store.read_all())
+        return app.response_class(render(merged),
+                                  mimetype='text/plain; version=0.0.4')
+
@@ -4,21 +4,77 @@ Define models for Headline application.
 The SQLAlchemy models for the database is defined here.
 """
 
+from collections import namedtuple
+from contextlib import contextmanager
 from datetime import datetime
+import json
+import re
 
 from flask import current_app
-from itsdangerous import (
-    TimedJSONWebSignatureSerializer as Serializer,
-    BadSignature, SignatureExpired)
-from werkzeug.security import check_password_hash, generate_password_hash
 import sqlalchemy
+from sqlalchemy.orm import make_transient_to_detached
 
 from . import db
-from .id_generator import PushID
-from .helpers import to_camel_case
+from .cache import TTLCache
+from .hashing import password_hasher
+from .id_generator import LocalPushID, PushID
+from .serializers import get_serializer
+from .tokens import get_codec, token_versions
 
 
-push_id = PushID()
+# One generator per thread and process, see LocalPushID.
+push_id = LocalPushID()
+
+# Column values of recently fetched rows, keyed by (model name, id).
+# Configured from IDENTITY_CACHE_SIZE and IDENTITY_CACHE_TTL in create_app.
+identity_cache = TTLCache()
+
+# Exact row counts keyed by (model name, SQL, parameters). Configured from
+# COUNT_CACHE_SIZE and COUNT_CACHE_TTL in create_app.
+count_cache = TTLCache()
+
+
+class UniqueViolation(Exception):
+    """Raised when a row can't be inserted because a unique value exists."""
+
+    def __init__(self, column, value):
+        super(UniqueViolation, self).__init__(
+            '{}:{} already exist'.format(column, value))
+        self.column = column
+        self.value = value
+
+
+class Batch(object):
+    """
+    Collect the writes of a Base.batch block.
+
+    Pending saves and deletes are flushed in chunks of `chunk_size` and
+    committed once when the block ends. `ok` tells whether that worked.
+    """
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        self.saves = []
+        self.deletes = []
+        self.ok = None
+
+    def commit(self):
+        """Write the pending changes in one transaction; return True/False."""
+        try:
+            Base.flush_chunked(self.saves, db.session.add, self.chunk_size)
+            Base.flush_chunked(self.deletes, db.session.delete,
+                               self.chunk_size)
+            db.session.commit()
+        except sqlalchemy.exc.SQLAlchemyError:
+            db.session.rollback()
+            self.ok = False
+            return False
+        for obj in self.saves + self.deletes:
+            obj.invalidate_cached(*sqlalchemy.inspect(obj).identity)
+        for model in set(type(obj) for obj in self.saves + self.deletes):
+            model.invalidate_counts()
+        self.ok = True
+        return True
 
 
 class Base(db.Model):
@@ -31,17 +87,25 @@ class Base(db.Model):
 
     __abstract__ = True
 
-    id = db.Column(db.String, primary_key=True)
+    # Push IDs must compare byte by byte for their time ordering to hold, so
+    # Postgres gets the "C" collation instead of the locale default.
+    id = db.Column(
+        db.String().with_variant(db.String(collation='C'), 'postgresql'),
+        primary_key=True)
     date_created = db.Column(
-        db.DateTime, default=datetime.now(), nullable=False)
+        db.DateTime, default=datetime.now, nullable=False)
     date_modified = db.Column(
-        db.DateTime, default=datetime.now(),
-        onupdate=datetime.now(), nullable=False)
+        db.DateTime, default=datetime.now,
+        onupdate=datetime.now, nullable=False)
 
-    def serialize(self):
+    def serialize(self, fields=None):
         """Map model objects to dict representation."""
-        return {to_camel_case(column.name): getattr(self, column.name)
-                for column in self.__table__.columns}
+        return get_serializer(type(self), fields).serialize(self)
+
+    @classmethod
+    def serialize_many(cls, rows, fields=None):
+        """Map a list of model objects to dict representations."""
+        return get_serializer(cls, fields).serialize_many(rows)
 
     def save(self):
         """
@@ -49,9 +113,15 @@ class Base(db.Model):
 
         Save instance of the object to database and commit.
         """
+        batch = db.session.info.get('batch')
+        if batch is not None:
+            batch.saves.append(self)
+            return True
         try:
             db.session.add(self)
             db.session.commit()
+            self.invalidate_cached(*sqlalchemy.inspect(self).identity)
+            self.invalidate_counts()
             return True
         except (sqlalchemy.exc.SQLAlchemyError,
                 sqlalchemy.exc.IntegrityError,
@@ -59,34 +129,317 @@ class Base(db.Model):
             db.session.rollback()
             return False
 
+    def insert(self):
+        """
+        Insert into database in a single statement.
+
+        The row is written with one INSERT and a commit, without a lookup
+        beforehand or a refresh afterwards; the instance is left detached
+        with its values, including the defaults, still loaded. Returns True
+        when inserted and False on errors, but raises UniqueViolation
+        naming the column when a unique value already exists.
+        """
+        if self.id is None:
+            self.id = push_id.next_id()
+        values = {}
+        for column in self.__table__.columns:
+            value = getattr(self, column.key)
+            if value is None and column.default is not None and \
+                    column.default.is_scalar:
+                value = column.default.arg
+                setattr(self, column.key, value)
+            if value is None and (column.default is not None or
+                                  column.server_default is not None):
+                # an explicit NULL would override the column's default
+                continue
+            values[column.key] = value
+
+        try:
+            result = db.session.execute(
+                self.__table__.insert().values(**values))
+            # the values of the Python-side defaults, e.g. timestamps
+            for key, value in result.last_inserted_params().items():
+                if key not in values:
+                    setattr(self, key, value)
+            db.session.commit()
+        except sqlalchemy.exc.IntegrityError as error:
+            db.session.rollback()
+            column = self.violated_column(error)
+            if column is None:
+                return False
+            raise UniqueViolation(column, values.get(column))
+        except sqlalchemy.exc.SQLAlchemyError:
+            db.session.rollback()
+            return False
+
+        make_transient_to_detached(self)
+        self.invalidate_counts()
+        return True
+
+    @classmethod
+    def violated_column(cls, error):
+        """
+        Name the unique column an IntegrityError was raised for.
+
+        Understands the messages of Postgres and SQLite; returns None when
+        no unique column can be identified.
+        """
+        message = str(error.orig)
+        diag = getattr(error.orig, 'diag', None)
+        constraint = getattr(diag, 'constraint_name', None)
+        table = cls.__tablename__
+        unique = [column for column in cls.__table__.columns
+                  if column.unique or column.primary_key]
+        if constraint:
+            # Postgres' names for primary keys, unique constraints and the
+            # unique indexes of index=True columns
+            for column in unique:
+                if constraint in ('{}_pkey'.format(table)
+                                  if column.primary_key else None,
+                                  '{}_{}_key'.format(table, column.name),
+                                  'ix_{}_{}'.format(table, column.name)):
+                    return column.name
+        for column in unique:
+            # Postgres: "Key (email)=(...)", SQLite: "failed: users.email"
+            if re.search(r'Key \({}\)=|\b{}\.{}\b'.format(
+                    re.escape(column.name), re.escape(table),
+                    re.escape(column.name)), message):
+                return column.name
+        return None
+
     def delete(self):
         """
         Delete from database.
 
         Deletes instance of an object from database
         """
+        batch = db.session.info.get('batch')
+        if batch is not None:
+            batch.deletes.append(self)
+            return True
         try:
             db.session.delete(self)
             db.session.commit()
+            self.invalidate_cached(*sqlalchemy.inspect(self).identity)
+            self.invalidate_counts()
             return True
         except sqlalchemy.exc.SQLAlchemyError:
             db.session.rollback()
             return False
 
+    @staticmethod
+    def flush_chunked(objs, operation, chunk_size):
+        """
+        Apply operation to objs and flush them in chunks.
+
+        New objects get their push IDs in one batch first, so the inserts
+        of a chunk go out as a single executemany.
+        """
+        new = [obj for obj in objs if obj.id is None]
+        for obj, new_id in zip(new, push_id.next_ids(len(new))):
+            obj.id = new_id
+        for start in range(0, len(objs), chunk_size):
+            for obj in objs[start:start + chunk_size]:
+                operation(obj)
+            db.session.flush()
+
+    @classmethod
+    def save_all(cls, objs, chunk_size=1000):
+        """
+        Save many objects to database.
+
+        The objects are flushed in chunks and committed together.
+        """
+        batch = Batch(chunk_size)
+        batch.saves = list(objs)
+        return batch.commit()
+
+    @classmethod
+    def delete_where(cls, *criterion, **kwargs):
+        """
+        Delete the data of the model matching the filters.
+
+        Rows are removed with a single DELETE statement; objects already
+        loaded in the session aren't updated.
+        """
+        try:
+            cls.query.filter(*criterion).filter_by(**kwargs).delete(
+                synchronize_session=False)
+            db.session.commit()
+        except sqlalchemy.exc.SQLAlchemyError:
+            db.session.rollback()
+            return False
+        identity_cache.invalidate_where(lambda key: key[0] == cls.__name__)
+        cls.invalidate_counts()
+        return True
+
+    @classmethod
+    @contextmanager
+    def batch(cls, chunk_size=1000):
+        """
+        Collect the saves and deletes made in a block.
+
+        Inside `with Base.batch() as batch:` save and delete only queue the
+        object; everything is flushed in chunks and committed once when the
+        block ends, and `batch.ok` holds the True/False result. Nested
+        blocks join the outer one.
+        """
+        batch = db.session.info.get('batch')
+        if batch is not None:
+            yield batch
+            return
+
+        batch = db.session.info['batch'] = Batch(chunk_size)
+        try:
+            yield batch
+        except Exception:
+            batch.ok = False
+            raise
+        finally:
+            del db.session.info['batch']
+        batch.commit()
+
     @classmethod
     def fetch_all(cls):
         """ Returns all the data in the model"""
         return cls.query.all()
 
+    @classmethod
+    def iter_all(cls, batch_size=1000):
+        """
+        Iterate over all the data in the model.
+
+        Rows are fetched `batch_size` at a time, through a server-side
+        cursor where the driver has one, so memory stays flat.
+        """
+        return iter(cls.query.yield_per(batch_size))
+
     @classmethod
     def get(cls, *args):
         """Returns data by the Id"""
         return cls.query.get(*args)
 
+    @classmethod
+    def get_cached(cls, id):
+        """
+        Returns data by the Id, served from the identity cache if possible.
+
+        Cached rows are attached to the session without a query. Writes made
+        through save and delete invalidate the entry; other writes are
+        picked up once the entry expires.
+        """
+        key = (cls.__name__, id)
+        values = identity_cache.get(key)
+        if values is None:
+            instance = cls.query.get(id)
+            if instance is not None:
+                identity_cache.set(key, {
+                    attr.key: getattr(instance, attr.key)
+                    for attr in sqlalchemy.inspect(cls).column_attrs})
+            return instance
+
+        instance = cls(**values)
+        make_transient_to_detached(instance)
+        return db.session.merge(instance, load=False)
+
+    @classmethod
+    def invalidate_cached(cls, id):
+        """Drop the identity cache entry of the data with the Id"""
+        identity_cache.invalidate((cls.__name__, id))
+
     @classmethod
     def count(cls):
         """Returns the count of all the data in the model"""
-        return cls.query.count()
+        return cls.count_query(cls.query)
+
+    @classmethod
+    def version(cls, query=None):
+        """
+        Returns a value that changes whenever the rows of a query do.
+
+        The value combines the number of rows, the highest Push ID and the
+        latest modification, read with one aggregate query, so it can
+        stand for the rows in an ETag.
+        """
+        query = (query if query is not None else cls.query).order_by(None)
+        total, last_id, modified = query.with_entities(
+            sqlalchemy.func.count(cls.id), sqlalchemy.func.max(cls.id),
+            sqlalchemy.func.max(cls.date_modified)).one()
+        return '{}:{}:{}'.format(
+            total, last_id, modified.isoformat() if modified else '')
+
+    @classmethod
+    def count_query(cls, query):
+        """
+        Returns the count of the rows matched by a query of the model.
+
+        Counts are cached per query until the model is written through
+        save, insert, delete or their batch versions, or until
+        COUNT_CACHE_TTL passes for writes made by other workers.
+        """
+        query = query.order_by(None)
+        compiled = query.statement.compile()
+        key = (cls.__name__, str(compiled),
+               repr(sorted(compiled.params.items())))
+        total = count_cache.get(key)
+        if total is None:
+            total = query.count()
+            count_cache.set(key, total)
+        return total
+
+    @classmethod
+    def count_total(cls, query, estimate_over=None):
+        """
+        Returns the total of a query and whether it is exact.
+
+        With `estimate_over` set, Postgres' planner estimate is returned
+        instead of an exact count when it is at least that large. Other
+        databases always get an exact (cached) count.
+        """
+        if estimate_over is not None and \
+                db.session.bind.dialect.name == 'postgresql':
+            estimate = cls.estimate_count(query)
+            if estimate is not None and estimate >= estimate_over:
+                return estimate, False
+        return cls.count_query(query), True
+
+    @classmethod
+    def estimate_count(cls, query):
+        """
+        Returns Postgres' estimate of the rows matched by a query.
+
+        Unfiltered queries read the table statistics in pg_class, filtered
+        ones the row estimate of EXPLAIN. Returns None when there is no
+        estimate, e.g. for a table that was never analyzed.
+        """
+        query = query.order_by(None)
+        try:
+            if query.whereclause is None:
+                estimate = db.session.execute(
+                    sqlalchemy.text('SELECT reltuples FROM pg_class '
+                                    'WHERE oid = CAST(:table AS regclass)'),
+                    {'table': cls.__tablename__}).scalar()
+            else:
+                sql = str(query.statement.compile(
+                    dialect=db.session.bind.dialect,
+                    compile_kwargs={'literal_binds': True}))
+                plan = db.session.execute(sqlalchemy.text(
+                    'EXPLAIN (FORMAT JSON) ' + sql.replace(':', r'\:'))
+                ).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                estimate = plan[0]['Plan']['Plan Rows']
+        except (sqlalchemy.exc.SQLAlchemyError, NotImplementedError):
+            db.session.rollback()
+            return None
+        if estimate is None or estimate < 0:
+            return None
+        return int(estimate)
+
+    @classmethod
+    def invalidate_counts(cls):
+        """Drop the cached counts of the model"""
+        count_cache.invalidate_where(lambda key: key[0] == cls.__name__)
 
     @classmethod
     def get_first_item(cls):
@@ -98,11 +451,32 @@ class Base(db.Model):
         """Query and order the data of the model"""
         return cls.query.order_by(*args)
 
+    @classmethod
+    def created_between(cls, start, end=None):
+        """
+        Query the data of the model created between start and end.
+
+        Push IDs sort by creation time, so the range is answered from the
+        primary key index. `start` is inclusive, `end` is exclusive and both
+        are datetimes, naive ones being read as local time.
+        """
+        query = cls.query.filter(
+            cls.id >= PushID.lower_bound(int(start.timestamp() * 1000)))
+        if end is not None:
+            query = query.filter(
+                cls.id < PushID.lower_bound(int(end.timestamp() * 1000)))
+        return query.order_by(cls.id)
+
     @classmethod
     def filter_all(cls, **kwargs):
         """Query and filter the data of the model"""
         return cls.query.filter(**kwargs).all()
 
+    @classmethod
+    def iter_filter(cls, batch_size=1000, **kwargs):
+        """Iterate over the filtered data of the model, like iter_all."""
+        return iter(cls.query.filter_by(**kwargs).yield_per(batch_size))
+
     @classmethod
     def filter_by(cls, **kwargs):
         """Query and filter the data of the model"""
@@ -119,7 +493,7 @@ class Base(db.Model):
     @classmethod
     def filter_and_count(cls, **kwargs):
         """Query, filter and counts all the data of a model"""
-        return cls.query.filter_by(**kwargs).count()
+        return cls.count_query(cls.query.filter_by(**kwargs))
 
     @classmethod
     def filter_and_order(cls, *args, **kwargs):
@@ -140,6 +514,8 @@ class User(Base):
     password = db.Column(db.String(128), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     isVerified = db.Column(db.Boolean, default=False)
+    token_version = db.Column(db.Integer, default=0, server_default='0',
+                              nullable=False)
 
     def hash_password(self, password):
         """
@@ -147,7 +523,7 @@ class User(Base):
 
         Passwords shouldn't be stored as string so we hash them.
         """
-        self.password = generate_password_hash(password)
+        self.password = password_hasher.hash(password)
 
     def verify_password(self, password):
         """
@@ -156,7 +532,16 @@ class User(Base):
         Use the pwd_context to decrypt the password hash and confirm if it
         matches the initial password set by the user.
         """
-        return check_password_hash(self.password, password)
+        return password_hasher.check(self.password, password)
+
+    def password_needs_rehash(self):
+        """
+        Check the password hash against the configured work factor.
+
+        Hashes made with an outdated method should be replaced on the next
+        successful login.
+        """
+        return password_hasher.needs_rehash(self.password)
 
     def generate_auth_token(self, expiration=36000):
         """
@@ -164,8 +549,7 @@ class User(Base):
 
         This function generates a token to be used by the user for requests.
         """
-        s = Serializer(current_app.config['SECRET_KEY'], expires_in=expiration)
-        return s.dumps({'id': self.id})
+        return get_codec().dumps({'id': self.id}, expiration)
 
     @staticmethod
     def verify_auth_token(token):
@@ -175,19 +559,66 @@ class User(Base):
         Verify that the token is valid and return the user id.
         """
 
-        s = Serializer(current_app.config['SECRET_KEY'])
-        try:
-            data = s.loads(token)
-        except SignatureExpired:
+        data = get_codec().loads(token)
+        if data is None:
+            # invalid or expired token
             return None
 
-            # valid token, but expired
-        except BadSignature:
+        user = User.get_cached(data['id'])
+        return user
+
+    def generate_claims_token(self, expiration=None):
+        """
+        Generate a claims token.
+
+        The token carries everything a request handler needs about the user
+        so that verifying it doesn't require a database query. It lasts at
+        most CLAIMS_TOKEN_EXPIRATION seconds, as long as revocations are
+        remembered.
+        """
+        limit = current_app.config['CLAIMS_TOKEN_EXPIRATION']
+        expiration = limit if expiration is None else min(expiration, limit)
+        return get_codec().dumps({'id': self.id, 'username': self.username,
+                                  'isVerified': bool(self.isVerified),
+                                  'v': self.token_version or 0}, expiration)
+
+    @staticmethod
+    def verify_claims_token(token):
+        """
+        Verify a claims token.
+
+        Verify the token and return the UserClaims it carries. Tokens
+        without claims are looked up like verify_auth_token does.
+        """
+
+        data = get_codec().loads(token)
+        if data is None:
             return None
 
-            # invalid token
-        user = User.query.get(data['id'])
-        return user
+        if 'v' not in data:
+            return User.get_cached(data['id'])
+
+        # tokens issued before a revocation
+        if token_versions.is_revoked(data['id'], data['v']):
+            return None
+        return UserClaims(data['id'], data['username'], data['isVerified'],
+                          data['v'])
+
+    def revoke_tokens(self):
+        """
+        Revoke all the claims tokens issued to the user so far.
+
+        The token version is bumped and published to the token version
+        store. With the default in-process store only this worker rejects
+        the old tokens until they expire; with a shared TOKEN_VERSION_STORE
+        every worker does.
+        """
+        self.token_version = (self.token_version or 0) + 1
+        if not self.save():
+            return False
+        token_versions.revoke(self.id, self.token_version,
+                              current_app.config['CLAIMS_TOKEN_EXPIRATION'])
+        return True
 
     def to_json(self):
         """
@@ -208,9 +639,26 @@ class User(Base):
         return '<User: {}>'.format(self.username)
 
 
+class UserClaims(namedtuple('UserClaims',
+                            'id username isVerified token_version')):
+    """
+    Represent a user authenticated through a claims token.
+
+    A lightweight stand-in for User built from the token alone. Use
+    User.get_cached(claims.id) when the full row is needed.
+    """
+
+    __slots__ = ()
+
+    def to_json(self):
+        """Display the claims the same way User.to_json does."""
+        return {'username': self.username}
+
+
 def fancy_id_generator(mapper, connection, target):
     """A function to generate unique identifiers on insert."""
-    target.id = push_id.next_id()
+    if target.id is None:
+        target.id = push_id.next_id()
 
 
 # associate the listener function with models, to execute during the
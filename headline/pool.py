@@ -0,0 +1,126 @@
+"""
+Connection pool instrumentation for the Headline API.
+
+Every engine the application creates is instrumented when it is first
+handed out. Connects, checkouts, checkins and invalidations are counted,
+and for queue pools the time spent waiting for a connection is measured.
+pool_status() reports the numbers for sizing pools across workers.
+"""
+from time import perf_counter
+import threading
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats(object):
+    """Counters of a single connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def checked_out(self):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def checked_in(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def waited(self, seconds):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def as_dict(self, pool):
+        """Return the counters together with the pool's current state."""
+        with self._lock:
+            stats = {
+                'pool': type(pool).__name__,
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'invalidations': self.invalidations,
+                'in_use': self.in_use,
+                'max_in_use': self.max_in_use,
+                'wait_avg_ms': (self.wait_total / self.checkouts * 1000
+                                if self.checkouts else 0.0),
+                'wait_max_ms': self.wait_max * 1000
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(size=pool.size(), idle=pool.checkedin(),
+                         overflow=pool.overflow(), timeout=pool.timeout())
+        return stats
+
+
+class InstrumentedQueuePool(QueuePool):
+    """A QueuePool timing how long each checkout waits for a connection."""
+
+    stats = None
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super(InstrumentedQueuePool, self)._do_get()
+        finally:
+            if self.stats is not None:
+                self.stats.waited(perf_counter() - start)
+
+    def recreate(self):
+        pool = super(InstrumentedQueuePool, self).recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def _ping(dbapi_connection, connection_record, connection_proxy):
+    # pessimistic disconnect handling: make the pool replace connections
+    # that died while they sat idle
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('SELECT 1')
+    except Exception:
+        raise exc.DisconnectionError()
+    finally:
+        cursor.close()
+
+
+def instrument(app, bind, engine):
+    """Instrument engine, the engine of bind, unless already done."""
+    registry = app.extensions.setdefault('pool_stats', {})
+    entry = registry.get(bind)
+    if entry is not None and entry[0] is engine:
+        return
+    stats = PoolStats()
+    registry[bind] = (engine, stats)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.stats = stats
+
+    def connect(*args):
+        with stats._lock:
+            stats.connects += 1
+
+    def invalidate(*args):
+        with stats._lock:
+            stats.invalidations += 1
+
+    if app.config.get('SQLALCHEMY_POOL_PRE_PING'):
+        event.listen(engine, 'checkout', _ping)
+    event.listen(engine, 'connect', connect)
+    event.listen(engine, 'checkout', lambda *args: stats.checked_out())
+    event.listen(engine, 'checkin', lambda *args: stats.checked_in())
+    event.listen(engine, 'invalidate', invalidate)
+
+
+def pool_status(app):
+    """Return the pool statistics of every engine of app, keyed by bind."""
+    registry = app.extensions.get('pool_stats', {})
+    return {bind or 'default': stats.as_dict(engine.pool)
+            for bind, (engine, stats) in registry.items()}
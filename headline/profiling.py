@@ -0,0 +1,156 @@
+"""
+Per-request SQL profiling for the Headline API.
+
+With SQL_PROFILING set, every statement executed during a request is
+counted and timed. The totals are sent in a Server-Timing header, kept in
+a rolling summary per endpoint and, when the same statement runs
+SQL_PROFILING_REPEAT_THRESHOLD times or more in one request, logged as a
+likely N+1 query.
+"""
+from collections import Counter, deque
+from time import perf_counter
+import threading
+
+from flask import _app_ctx_stack, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestProfile(object):
+    """The statements executed during a single request."""
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.statements = Counter()
+        self.db_time = 0.0
+
+    @property
+    def count(self):
+        return sum(self.statements.values())
+
+    def repeated(self, threshold):
+        """Return the statements executed at least threshold times."""
+        return [(statement, count)
+                for statement, count in self.statements.most_common()
+                if count >= threshold]
+
+
+class ProfileSummary(object):
+    """The profiles of the last `window` requests to each endpoint."""
+
+    def __init__(self, window=100):
+        self.window = window
+        self._lock = threading.Lock()
+        self._profiles = {}
+        self._repeats = Counter()
+
+    def add(self, endpoint, profile, repeated):
+        with self._lock:
+            profiles = self._profiles.get(endpoint)
+            if profiles is None:
+                profiles = self._profiles[endpoint] = deque(
+                    maxlen=self.window)
+            profiles.append((profile.count, profile.db_time))
+            if repeated:
+                self._repeats[endpoint] += 1
+
+    def summary(self):
+        """Return statement counts and DB time per endpoint."""
+        with self._lock:
+            result = {}
+            for endpoint, profiles in self._profiles.items():
+                counts = [count for count, _ in profiles]
+                times = [db_time for _, db_time in profiles]
+                result[endpoint] = {
+                    'requests': len(profiles),
+                    'statements_avg': sum(counts) / len(profiles),
+                    'statements_max': max(counts),
+                    'db_ms_avg': sum(times) / len(profiles) * 1000,
+                    'db_ms_max': max(times) * 1000,
+                    'repeated': self._repeats[endpoint]
+                }
+            return result
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    if _app_ctx_stack.top is not None and ('sql_profile' in g or
+                                           'db_time' in g):
+        conn.info.setdefault('profile_start', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    starts = conn.info.get('profile_start')
+    if not starts or _app_ctx_stack.top is None:
+        return
+    elapsed = perf_counter() - starts.pop()
+    if 'db_time' in g:
+        g.db_time += elapsed
+    profile = g.get('sql_profile')
+    if profile is not None:
+        profile.db_time += elapsed
+        # bound parameters keep values out of the statement, so its text
+        # is the statement's shape
+        profile.statements[statement] += 1
+
+
+def _handle_error(context):
+    # after_cursor_execute doesn't fire for a failed statement, and the
+    # info dict outlives the request with the pooled connection
+    conn = context.connection
+    if conn is not None and conn.info.get('profile_start'):
+        conn.info['profile_start'].pop()
+
+
+def track_statements():
+    """
+    Time the statements of every engine.
+
+    Requests are profiled while g.sql_profile is set, and g.db_time, when
+    set, accumulates their DB time.
+    """
+    if not event.contains(Engine, 'before_cursor_execute',
+                          _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+
+def init_app(app):
+    """Profile the SQL of app's requests if SQL_PROFILING is set."""
+    if not app.config.get('SQL_PROFILING'):
+        return
+    summary = app.extensions['sql_profile'] = ProfileSummary(
+        app.config['SQL_PROFILING_WINDOW'])
+    threshold = app.config['SQL_PROFILING_REPEAT_THRESHOLD']
+    track_statements()
+
+    @app.before_request
+    def start_profile():
+        g.sql_profile = RequestProfile()
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        total = perf_counter() - profile.start
+        repeated = profile.repeated(threshold)
+        for statement, count in repeated:
+            app.logger.warning('Possible N+1: %d identical statements in '
+                               '%s %s: %s', count, request.method,
+                               request.path, statement)
+        summary.add(request.endpoint, profile, repeated)
+        response.headers.add(
+            'Server-Timing', 'db;dur={:.2f};desc="{} queries"'.format(
+                profile.db_time * 1000, profile.count))
+        response.headers.add(
+            'Server-Timing', 'total;dur={:.2f}'.format(total * 1000))
+        return response
+
+
+def sql_summary(app):
+    """Return the rolling per-endpoint SQL summary of app."""
+    summary = app.extensions.get('sql_profile')
+    return summary.summary() if summary is not None else {}
@@ -0,0 +1,90 @@
+"""
+Rate limiting for the Headline API.
+
+Requests are counted with a sliding window counter: hits in the current
+fixed window plus the previous window's hits weighted by how much of it
+still overlaps the sliding window. Counters live in a RateLimitStore.
+"""
+from time import time
+import threading
+
+
+class RateLimitStore(object):
+    """
+    Interface of the counters used by RateLimiter.
+
+    Shared stores, for example one backed by Redis INCR and EXPIRE, let all
+    workers and hosts see the same counts.
+    """
+
+    def incr(self, key, expires):
+        """Increment key, expiring it after `expires` seconds; return it."""
+        raise NotImplementedError
+
+    def get(self, key):
+        """Return the value of key, or 0 if it doesn't exist."""
+        raise NotImplementedError
+
+
+class MemoryStore(RateLimitStore):
+    """Keep counters in the memory of the current process."""
+
+    # expired counters are swept every SWEEP_EVERY increments
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._increments = 0
+
+    def incr(self, key, expires):
+        now = time()
+        with self._lock:
+            self._increments += 1
+            if self._increments % self.SWEEP_EVERY == 0:
+                self._counters = {k: v for k, v in self._counters.items()
+                                  if v[1] > now}
+            counter = self._counters.get(key)
+            if counter is None or counter[1] <= now:
+                counter = self._counters[key] = [0, now + expires]
+            counter[0] += 1
+            return counter[0]
+
+    def get(self, key):
+        counter = self._counters.get(key)
+        if counter is None or counter[1] <= time():
+            return 0
+        return counter[0]
+
+
+class RateLimiter(object):
+    """Count hits per key and decide whether a key is over its limit."""
+
+    def __init__(self, store=None):
+        self.configure(store)
+
+    def configure(self, store=None):
+        """Use store for the counters, or a new MemoryStore if it's None."""
+        self.store = store if store is not None else MemoryStore()
+        self.limited = 0
+
+    def hit(self, key, limit, per):
+        """
+        Record a hit on key.
+
+        Returns None if key is within `limit` hits per `per` seconds,
+        otherwise the number of seconds after which to retry.
+        """
+        now = time()
+        window = int(now // per)
+        elapsed = now - window * per
+        current = self.store.incr('{}:{}'.format(key, window), per * 2)
+        previous = self.store.get('{}:{}'.format(key, window - 1))
+        if previous * (per - elapsed) / per + current <= limit:
+            return None
+        self.limited += 1
+        return int(per - elapsed) + 1
+
+
+# Configured with the RATE_LIMIT_STORE setting in create_app.
+rate_limiter = RateLimiter()
@@ -0,0 +1,123 @@
+"""
+Read replica routing for the Headline API.
+
+Plain SELECTs go to the replicas in SQLALCHEMY_REPLICA_URIS, round-robin.
+Everything else goes to the primary: flushes, INSERT/UPDATE/DELETE, text
+statements and SELECT ... FOR UPDATE. Once a session has written, it stays
+on the primary until it is removed at the end of the request, so a request
+reads its own writes.
+"""
+from itertools import count
+from time import monotonic
+import threading
+
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, exc, orm
+from sqlalchemy.sql import Select
+
+from . import pool
+
+
+class ReplicaSet(object):
+    """
+    Hand out replica engines round-robin, skipping unhealthy ones.
+
+    A replica is skipped for `retry_after` seconds after it fails to connect
+    or drops a connection.
+    """
+
+    def __init__(self, engines, retry_after=30):
+        self.engines = list(engines)
+        self.retry_after = retry_after
+        self._down_until = {}
+        self._turn = count()
+        self._lock = threading.Lock()
+        for engine in self.engines:
+            event.listen(engine, 'handle_error', self._handle_error)
+
+    def pick(self):
+        """Return the next healthy replica engine, or None if there's none."""
+        now = monotonic()
+        for _ in range(len(self.engines)):
+            engine = self.engines[next(self._turn) % len(self.engines)]
+            if self._down_until.get(engine, 0) <= now:
+                return engine
+        return None
+
+    def mark_down(self, engine):
+        """Stop using engine for `retry_after` seconds."""
+        with self._lock:
+            self._down_until[engine] = monotonic() + self.retry_after
+
+    def _handle_error(self, context):
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception,
+                                               exc.OperationalError):
+            self.mark_down(context.engine)
+
+
+class RoutingSession(SignallingSession):
+    """A session sending reads to replicas and writes to the primary."""
+
+    def get_bind(self, mapper=None, clause=None):
+        replicas = self.app.extensions.get('replicas')
+        if replicas is not None and not self.info.get('primary') and \
+                not self._flushing and isinstance(clause, Select) and \
+                clause._for_update_arg is None:
+            engine = replicas.pick()
+            if engine is not None:
+                return engine
+        if self._flushing or (clause is not None and
+                              not isinstance(clause, Select)):
+            # read your writes for the rest of the request
+            self.info['primary'] = True
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """
+    Flask-SQLAlchemy using RoutingSession for its sessions.
+
+    Engines get an InstrumentedQueuePool, except on SQLite, and are
+    instrumented as they are handed out; see headline.pool.
+    """
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, info, options):
+        if info.drivername.startswith('sqlite'):
+            # SQLite gets a NullPool, which takes none of the queue options
+            for key in ('pool_size', 'max_overflow', 'pool_timeout'):
+                options.pop(key, None)
+        else:
+            options.setdefault('poolclass', pool.InstrumentedQueuePool)
+        super(RoutingSQLAlchemy, self).apply_driver_hacks(app, info, options)
+
+    def get_engine(self, app=None, bind=None):
+        app = self.get_app(app)
+        engine = super(RoutingSQLAlchemy, self).get_engine(app, bind)
+        pool.instrument(app, bind, engine)
+        return engine
+
+
+def init_app(app):
+    """
+    Set up the replicas configured for app.
+
+    Each URI in SQLALCHEMY_REPLICA_URIS is registered as a
+    `replica<n>` bind, which create_all leaves alone.
+    """
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    if not uris:
+        app.extensions.pop('replicas', None)
+        return
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    names = []
+    for index, uri in enumerate(uris):
+        names.append('replica{}'.format(index))
+        binds[names[-1]] = uri
+    app.config['SQLALCHEMY_BINDS'] = binds
+    db = get_state(app).db
+    app.extensions['replicas'] = ReplicaSet(
+        [db.get_engine(app, bind=name) for name in names],
+        app.config['REPLICA_RETRY_AFTER'])
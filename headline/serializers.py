@@ -0,0 +1,85 @@
+"""
+Compiled serializers for the Headline models.
+
+The column to key mapping of a model is worked out once per model and set
+of fields, and the values of a row are read with a single attrgetter.
+"""
+from datetime import date
+from operator import attrgetter
+
+from werkzeug.http import http_date
+
+from .helpers import to_camel_case
+
+
+class ModelSerializer(object):
+    """
+    Map instances of a model to dictionaries keyed by camel case names.
+
+    `fields` limits the output to the given columns, named either by
+    column or by camel case key.
+    """
+
+    def __init__(self, model, fields=None):
+        columns = [column for column in model.__table__.columns
+                   if fields is None or column.name in fields or
+                   to_camel_case(column.name) in fields]
+        self.keys = tuple(to_camel_case(column.name) for column in columns)
+        self.date_indexes = tuple(
+            index for index, column in enumerate(columns) if _is_date(column))
+        if len(columns) > 1:
+            self.getter = attrgetter(*[column.key for column in columns])
+        elif columns:
+            # attrgetter only returns a tuple for several attributes
+            getter = attrgetter(columns[0].key)
+            self.getter = lambda obj: (getter(obj),)
+        else:
+            self.getter = lambda obj: ()
+
+    def serialize(self, obj):
+        """Map obj to a dictionary of its column values."""
+        return dict(zip(self.keys, self.getter(obj)))
+
+    def serialize_many(self, rows, format_dates=True):
+        """
+        Map every row to a dictionary of its column values.
+
+        Dates are formatted the way Flask's JSON encoder would, each
+        distinct value only once for the whole batch.
+        """
+        keys, getter, date_indexes = self.keys, self.getter, self.date_indexes
+        if not (format_dates and date_indexes):
+            return [dict(zip(keys, getter(row))) for row in rows]
+
+        formatted = {}
+        result = []
+        for row in rows:
+            values = list(getter(row))
+            for index in date_indexes:
+                value = values[index]
+                if value is not None:
+                    text = formatted.get(value)
+                    if text is None:
+                        text = formatted[value] = http_date(value.timetuple())
+                    values[index] = text
+            result.append(dict(zip(keys, values)))
+        return result
+
+
+def _is_date(column):
+    try:
+        return issubclass(column.type.python_type, date)
+    except NotImplementedError:
+        return False
+
+
+_serializers = {}
+
+
+def get_serializer(model, fields=None):
+    """Return the cached serializer of model for the given fields."""
+    key = (model, frozenset(fields) if fields is not None else None)
+    serializer = _serializers.get(key)
+    if serializer is None:
+        serializer = _serializers[key] = ModelSerializer(model, fields)
+    return serializer
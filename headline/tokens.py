@@ -0,0 +1,173 @@
+"""
+Encode and verify the authentication tokens of the Headline API.
+
+Tokens are compact URL-safe signed JSON. The signing keys are derived once
+per application and key ring instead of on every call. Revoked claims
+tokens are recognized through the token versions kept in a
+TokenVersionStore.
+"""
+from time import time
+import hashlib
+import hmac
+import json
+import threading
+
+from flask import current_app
+from itsdangerous import (
+    TimedJSONWebSignatureSerializer, BadSignature, SignatureExpired,
+    base64_decode, base64_encode)
+
+
+class TokenCodec(object):
+    """
+    Sign and verify token payloads with a ring of secret keys.
+
+    New tokens are signed with the first key; the others are only used to
+    verify tokens issued before a key rotation. The expiry time is stored
+    in the payload under `exp`.
+    """
+
+    def __init__(self, secret_keys, salt='auth-token', accept_legacy=False):
+        self.secret_keys = tuple(secret_keys)
+        # HMAC-SHA1 states keyed with the derived keys, copied for each token
+        self.macs = [
+            hmac.new(hmac.new(_to_bytes(key), _to_bytes(salt),
+                              hashlib.sha256).digest(),
+                     digestmod=hashlib.sha1)
+            for key in self.secret_keys]
+        self.legacy_signers = []
+        if accept_legacy:
+            self.legacy_signers = [TimedJSONWebSignatureSerializer(key)
+                                   for key in self.secret_keys]
+
+    def dumps(self, payload, expiration):
+        """Return a token for payload that expires in `expiration` seconds."""
+        payload = dict(payload, exp=int(time()) + expiration)
+        value = base64_encode(json.dumps(payload, separators=(',', ':')))
+        return value + b'.' + self._sign(self.macs[0], value)
+
+    def loads(self, token):
+        """Return the payload of a valid token, or None."""
+        token = _to_bytes(token)
+
+        # JSON web signatures have a header section the compact tokens don't
+        if token.count(b'.') == 2:
+            return self._loads_legacy(token)
+
+        value, _, signature = token.rpartition(b'.')
+        for mac in self.macs:
+            if hmac.compare_digest(signature, self._sign(mac, value)):
+                break
+        else:
+            return None
+
+        try:
+            payload = json.loads(base64_decode(value).decode('utf-8'))
+        except (ValueError, TypeError):
+            return None
+        if not isinstance(payload, dict) or payload.get('exp', 0) < time():
+            return None
+        return payload
+
+    @staticmethod
+    def _sign(mac, value):
+        mac = mac.copy()
+        mac.update(value)
+        return base64_encode(mac.digest())
+
+    def _loads_legacy(self, token):
+        for signer in self.legacy_signers:
+            try:
+                return signer.loads(token)
+            except SignatureExpired:
+                return None
+            except BadSignature:
+                continue
+        return None
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return value.encode('utf-8')
+
+
+def get_codec():
+    """
+    Return the token codec of the current application.
+
+    The codec is rebuilt only when the configured keys change.
+    """
+    config = current_app.config
+    secret_keys = (config['SECRET_KEY'],) + tuple(config['OLD_SECRET_KEYS'])
+    codec = current_app.extensions.get('token_codec')
+    if codec is None or codec.secret_keys != secret_keys:
+        codec = TokenCodec(secret_keys,
+                           accept_legacy=config['ACCEPT_LEGACY_TOKENS'])
+        current_app.extensions['token_codec'] = codec
+    return codec
+
+
+class TokenVersionStore(object):
+    """
+    Interface of the latest token versions of users who revoked tokens.
+
+    Shared stores, for example one backed by Redis SET with EX, let all
+    workers and hosts reject revoked tokens, including workers started
+    after the revocation.
+    """
+
+    def get(self, user_id):
+        """Return the latest token version of user_id, or None."""
+        raise NotImplementedError
+
+    def set(self, user_id, version, expires):
+        """Record version for user_id for `expires` seconds."""
+        raise NotImplementedError
+
+
+class MemoryTokenVersionStore(TokenVersionStore):
+    """Keep token versions in the memory of the current process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def get(self, user_id):
+        entry = self._versions.get(user_id)
+        if entry is None or entry[1] <= time():
+            return None
+        return entry[0]
+
+    def set(self, user_id, version, expires):
+        now = time()
+        with self._lock:
+            # revocations are rare, so sweeping on each one is cheap
+            self._versions = {key: entry for key, entry in
+                              self._versions.items() if entry[1] > now}
+            self._versions[user_id] = (version, now + expires)
+
+
+class TokenVersions(object):
+    """The token versions claims tokens are checked against."""
+
+    def __init__(self, store=None):
+        self.configure(store)
+
+    def configure(self, store=None):
+        """Use store, or a new MemoryTokenVersionStore if it's None."""
+        self.store = store if store is not None else \
+            MemoryTokenVersionStore()
+
+    def is_revoked(self, user_id, version):
+        """Return True if tokens of version were revoked for user_id."""
+        latest = self.store.get(user_id)
+        return latest is not None and version < latest
+
+    def revoke(self, user_id, version, expires):
+        """Reject tokens of user_id older than version for `expires` s."""
+        self.store.set(user_id, version, expires)
+
+
+# Configured with the TOKEN_VERSION_STORE setting in create_app.
+token_versions = TokenVersions()
@@ -4,19 +4,13 @@ Python script for managing the flask application.
 This is the script that starts the flask application.
 """
 
-import unittest
-
-import dotenv
-from flask import render_template
 from flask_migrate import Migrate, MigrateCommand
 from flask_script import Shell, Manager, prompt_bool, Server
 
-from headline import db, create_app
+from headline import db
 from shell import make_shell_context
+from wsgi import app
 
-dotenv.load()
-app = create_app(dotenv.get('FLASK_CONFIG'))
-db.init_app(app)
 manager = Manager(app)
 migrate = Migrate(app, db)
 
@@ -31,6 +25,7 @@ def test():
     Add custom command to the manage.py script.
     The method runs all the test cases using the unittest module.
     """
+    import unittest
     tests = unittest.TestLoader().discover('tests')
     unittest.TextTestRunner(verbosity=2).run(tests)
 
@@ -41,7 +36,6 @@ def create_db():
     Create the database tables.
     Using the SQLAlchemy models the method creates database tables
     """
-    app = create_app(dotenv.get('FLASK_CONFIG'))
     with app.app_context():
         db.create_all()
 
@@ -53,20 +47,30 @@ def drop_db():
     Drops all tables in the database after confirmation from the user.
     """
     if prompt_bool("Are you sure you want to lose all your data?"):
-        app = create_app(dotenv.get('FLASK_CONFIG'))
         with app.app_context():
             db.drop_all()
 
 
-# Define root route
-@app.route('/', methods=['GET'])
-def index():
+@manager.option('path', help='CSV or JSON lines file of users')
+@manager.option('-c', '--chunk-size', dest='chunk_size', type=int,
+                default=1000, help='Rows written per transaction')
+@manager.option('-w', '--workers', dest='workers', type=int, default=None,
+                help='Password hashing processes, 0 hashes inline')
+@manager.option('--checkpoint', dest='checkpoint', default=None,
+                help='Progress file, defaults to <path>.checkpoint')
+def import_users(path, chunk_size=1000, workers=None, checkpoint=None):
     """
-    Index route for Headline NG API.
-
-    Doesn't require authentication, just there for the user to know what's up.
+    Import users in bulk.
+    Streams users from a file into the database in chunks and resumes from
+    the last committed chunk when run again after a failure.
     """
-    return render_template('index.html')
+    from headline.importer import ImportFailed, import_users as run_import
+    try:
+        imported = run_import(path, chunk_size, workers, checkpoint)
+    except ImportFailed as error:
+        print(error)
+        raise SystemExit(1)
+    print('Imported {} users.'.format(imported))
 
 
 # Run the application using the Flask manager
@@ -5,15 +5,11 @@ Write a function to import all the context and objects needed for a shell
 prompt.
 """
 
-import dotenv
+from flask import current_app
 
-from headline import db, create_app
+from headline import db
 from headline.models import User
 
-dotenv.load()
-
-app = create_app(dotenv.get('FLASK_CONFIG'))
-
 
 def make_shell_context():
     """
@@ -21,4 +17,4 @@ def make_shell_context():
 
     Import the model objects to enable easy interaction.
     """
-    return dict(app=app, db=db, User=User)
+    return dict(app=current_app._get_current_object(), db=db, User=User)
@@ -0,0 +1,94 @@
+"""
+Test admission control.
+
+Test requests beyond an endpoint class's slots and wait queue are shed
+with a 503.
+"""
+import json
+import threading
+import time
+import unittest
+
+from headline import db, create_app
+from headline.admission import ConcurrencyLimiter, admission
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    """The class encompasses the test cases for the concurrency limiter."""
+
+    def test_shed_when_queue_is_full(self):
+        """
+        Test shedding.
+
+        Test a request finding no slot and no room to wait is shed.
+        """
+        limiter = ConcurrencyLimiter(1, queue=0)
+        assert limiter.acquire() is True
+        assert limiter.acquire() is False
+        limiter.release()
+        assert limiter.acquire() is True
+        assert limiter.stats()['shed'] == 1
+        assert limiter.stats()['admitted'] == 2
+
+    def test_waiting_request_gets_released_slot(self):
+        """
+        Test the wait queue.
+
+        Test a waiting request takes the slot given back before its
+        deadline, and one waiting past it is shed.
+        """
+        limiter = ConcurrencyLimiter(1, queue=1, timeout=5)
+        limiter.acquire()
+        results = []
+        waiter = threading.Thread(
+            target=lambda: results.append(limiter.acquire()))
+        waiter.start()
+        while limiter.stats()['waiting'] == 0:
+            time.sleep(0.001)
+        limiter.release()
+        waiter.join()
+        assert results == [True]
+
+        limiter.timeout = 0.01
+        assert limiter.acquire() is False
+        assert limiter.stats()['shed'] == 1
+
+
+class TestAdmission(unittest.TestCase):
+    """The class encompasses the test cases for admission control."""
+
+    def setUp(self):
+        """
+        Set up the application for testing.
+
+        The method 'setUp' starts the application in test mode with no
+        capacity for the hashing endpoints.
+        """
+        self.app = create_app('testing')
+        admission.configure({'hashing': {'concurrency': 0,
+                                         'retry_after': 3}})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        admission.configure(self.app.config['ADMISSION_LIMITS'])
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_login_is_shed(self):
+        """
+        Test shed logins.
+
+        Test logins beyond capacity get a 503 with Retry-After while other
+        routes are served.
+        """
+        response = self.client.post(
+            '/auth/login', content_type='application/json',
+            data=json.dumps({'username': 'a', 'password': 'b'}))
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '3'
+        assert admission.stats()['hashing']['shed'] == 1
+        assert self.client.get('/auth/me').status_code == 401
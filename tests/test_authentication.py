@@ -3,13 +3,18 @@ Test Authentication.
 
 Test user authentication and token generation.
 """
+from time import time
+import base64
 import json
 import unittest
 
 from flask import url_for
+from werkzeug.security import generate_password_hash
 
 from headline import db, create_app
 from headline.models import User
+from headline.tokens import (
+    MemoryTokenVersionStore, get_codec, token_versions)
 
 
 class TestUserModel(unittest.TestCase):
@@ -180,3 +185,141 @@ class TestUserModel(unittest.TestCase):
                 content_type='application/json'
             )
         assert response.status_code == 401
+
+    def test_access_protected_route(self):
+        """
+        Test the protected route.
+
+        This test checks a token grants access to the current user's details
+        and a missing token doesn't.
+        """
+        token = self.user.generate_auth_token().decode('utf-8')
+        with self.client:
+            response = self.client.get(url_for('authentication.current_user'),
+                                       headers=self.auth_headers(token))
+            assert response.status_code == 200
+            assert json.loads(response.data)['data']['username'] == \
+                'test_user'
+
+            response = self.client.get(url_for('authentication.current_user'))
+            assert response.status_code == 401
+
+    def test_claims_token(self):
+        """
+        Test claims tokens.
+
+        This test checks a claims token is verified into the user's claims
+        and stops working once the user's tokens are revoked.
+        """
+        self.app.config['USE_CLAIMS_TOKENS'] = True
+        token = self.user.generate_claims_token().decode('utf-8')
+        claims = User.verify_claims_token(token)
+        assert claims.id == self.user.id
+        assert claims.username == 'test_user'
+        with self.client:
+            response = self.client.get(url_for('authentication.current_user'),
+                                       headers=self.auth_headers(token))
+            assert response.status_code == 200
+
+            assert self.user.revoke_tokens() is True
+            response = self.client.get(url_for('authentication.current_user'),
+                                       headers=self.auth_headers(token))
+            assert response.status_code == 401
+
+    def test_claims_token_revoked_everywhere(self):
+        """
+        Test revocations in a shared store.
+
+        This test checks a revocation published to a shared token version
+        store is seen by a worker that starts later, and claims tokens
+        don't outlive CLAIMS_TOKEN_EXPIRATION.
+        """
+        store = MemoryTokenVersionStore()
+        token_versions.configure(store)
+        token = self.user.generate_claims_token(expiration=10 ** 6)
+        assert get_codec().loads(token)['exp'] <= \
+            time() + self.app.config['CLAIMS_TOKEN_EXPIRATION']
+        assert self.user.revoke_tokens() is True
+
+        # a fresh worker knows only what the shared store does
+        token_versions.configure(store)
+        assert User.verify_claims_token(token) is None
+        token_versions.configure()
+        assert User.verify_claims_token(token) is not None
+
+    @staticmethod
+    def auth_headers(token):
+        """Build the basic auth headers carrying a token."""
+        credentials = base64.b64encode('{}:'.format(token).encode('utf-8'))
+        return {'Authorization': 'Basic ' + credentials.decode('utf-8')}
+
+    def test_login_rehashes_outdated_password(self):
+        """
+        Test rehash on login.
+
+        This test checks a password hashed with an outdated work factor is
+        rehashed with the configured one when the user signs in.
+        """
+        self.user.password = generate_password_hash(
+            'test_password', method='pbkdf2:sha256:500')
+        self.user.save()
+        with self.client:
+            response = self.client.post(
+                url_for('authentication.login'),
+                data=json.dumps(
+                    {'username': 'test_user', 'password': 'test_password'}),
+                content_type='application/json'
+            )
+        assert response.status_code == 200
+        user = User.query.filter_by(username='test_user').first()
+        assert user.password.startswith(
+            self.app.config['PASSWORD_HASH_METHOD'] + '$')
+
+    def test_login_rate_limit(self):
+        """
+        Test login rate limits.
+
+        This test checks sign in attempts over the limit get a 429 response,
+        whether they come from one address or target one username.
+        """
+        self.app.config['USE_RATE_LIMITS'] = True
+
+        def attempt(username, address):
+            return self.client.post(
+                url_for('authentication.login'),
+                data=json.dumps({'username': username, 'password': 'wrong'}),
+                content_type='application/json',
+                environ_base={'REMOTE_ADDR': address}
+            )
+
+        with self.client:
+            for _ in range(10):
+                assert attempt('test_user', '10.0.0.1').status_code == 401
+            response = attempt('someone_else', '10.0.0.1')
+            assert response.status_code == 429
+            assert int(response.headers['Retry-After']) > 0
+
+            for i in range(11):
+                response = attempt('target_user', '10.0.1.{}'.format(i))
+            assert response.status_code == 429
+
+    def test_register_with_existing_email(self):
+        """
+        Test register user.
+
+        This tests user registration route with an already registered email
+        reports the email as the conflict.
+        """
+        with self.client:
+            response = self.client.post(
+                url_for('authentication.register_user'),
+                data=json.dumps({
+                    'username': 'proton',
+                    'password': 'andela',
+                    'email': 'test@user.com'
+                }),
+                content_type='application/json'
+            )
+        assert response.status_code == 400
+        assert 'email:test@user.com' in \
+            json.loads(response.data)['details']['message']
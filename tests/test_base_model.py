@@ -0,0 +1,228 @@
+"""
+Test Base model.
+
+Test the query and persistence helpers shared by all models.
+"""
+from datetime import datetime, timedelta
+import unittest
+
+import sqlalchemy
+
+from headline import db, create_app
+from headline.id_generator import PushID
+from headline.models import UniqueViolation, User, identity_cache
+
+
+class TestBaseModel(unittest.TestCase):
+    """The class encompasses the test cases for the Base model helpers."""
+
+    def setUp(self):
+        """
+        Set up the application for testing.
+
+        The method 'setUp' starts the application in test mode with a few
+        users.
+        """
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        for name in ('ada', 'bayo', 'chidi'):
+            user = User(username=name, email='{}@user.com'.format(name))
+            user.hash_password('password')
+            user.save()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_created_between(self):
+        """
+        Test time range queries.
+
+        Test users are selected by the creation time held in their IDs.
+        """
+        two_days_ago = datetime.now() - timedelta(days=2)
+        old_id = PushID.encode_time(
+            int(two_days_ago.timestamp() * 1000)) + 'x' * 12
+        User.query.filter_by(username='ada').update({'id': old_id})
+        db.session.commit()
+
+        last_hour = User.created_between(datetime.now() - timedelta(hours=1))
+        assert [user.username for user in last_hour] == ['bayo', 'chidi']
+
+        older = User.created_between(two_days_ago - timedelta(minutes=1),
+                                     datetime.now() - timedelta(days=1))
+        assert [user.username for user in older] == ['ada']
+
+    def test_get_cached(self):
+        """
+        Test the identity cache.
+
+        Test a cached user is served without a query and survives the end of
+        the session it was loaded in.
+        """
+        user_id = User.find_first(username='bayo').id
+        db.session.remove()
+        assert User.get_cached(user_id).username == 'bayo'
+        db.session.remove()
+
+        hits = identity_cache.hits
+        user = User.get_cached(user_id)
+        assert identity_cache.hits == hits + 1
+        assert user.username == 'bayo'
+        assert user in db.session
+
+    def test_save_invalidates_cache(self):
+        """
+        Test identity cache invalidation.
+
+        Test saving a user drops its cached row so the change is seen.
+        """
+        user_id = User.find_first(username='chidi').id
+        user = User.get_cached(user_id)
+        user.email = 'chidi@headline.ng'
+        assert user.save() is True
+        db.session.remove()
+        assert User.get_cached(user_id).email == 'chidi@headline.ng'
+
+    def test_insert_is_a_single_statement(self):
+        """
+        Test single statement inserts.
+
+        Test a new user is written with one INSERT and can be used afterwards
+        without refreshing it from the database.
+        """
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = db.get_engine(self.app)
+        sqlalchemy.event.listen(engine, 'before_cursor_execute', count)
+        try:
+            user = User(username='dayo', email='dayo@user.com')
+            user.hash_password('password')
+            assert user.insert() is True
+            assert user.username == 'dayo'
+            assert user.token_version == 0
+            assert len(user.id) == 20
+            assert datetime.now() - user.date_created < timedelta(minutes=1)
+        finally:
+            sqlalchemy.event.remove(engine, 'before_cursor_execute', count)
+        assert len(statements) == 1
+        assert statements[0].startswith('INSERT')
+
+    def test_insert_reports_unique_violation(self):
+        """
+        Test conflicting inserts.
+
+        Test the column holding the duplicate value is named.
+        """
+        user = User(username='ada', email='new@user.com', password='x')
+        with self.assertRaises(UniqueViolation) as context:
+            user.insert()
+        assert context.exception.column == 'username'
+
+        user = User(username='new', email='bayo@user.com', password='x')
+        with self.assertRaises(UniqueViolation) as context:
+            user.insert()
+        assert context.exception.column == 'email'
+
+    def test_violated_column_on_postgres(self):
+        """
+        Test naming the column of a Postgres unique violation.
+
+        Test the constraint name is trusted first and the message is only
+        matched on its Key (column)= part, so values naming other columns
+        don't mislead it.
+        """
+        class Diag(object):
+            constraint_name = None
+
+        class Orig(Exception):
+            diag = Diag()
+
+        orig = Orig('duplicate key value violates unique constraint '
+                    '"users_x"\nDETAIL:  Key (username)=(id) already exists.')
+        error = sqlalchemy.exc.IntegrityError('INSERT', {}, orig)
+        assert User.violated_column(error) == 'username'
+        Diag.constraint_name = 'ix_users_email'
+        assert User.violated_column(error) == 'email'
+        Diag.constraint_name = 'users_pkey'
+        assert User.violated_column(error) == 'id'
+
+    def test_save_all(self):
+        """
+        Test saving in bulk.
+
+        Test many users are saved with their push IDs in one commit.
+        """
+        users = [User(username='user{}'.format(i), password='x',
+                      email='user{}@user.com'.format(i)) for i in range(25)]
+        assert User.save_all(users, chunk_size=10) is True
+        assert User.count() == 28
+        ids = [user.id for user in users]
+        assert ids == sorted(ids)
+
+        duplicate = User(username='ada', email='ada2@user.com', password='x')
+        assert User.save_all([duplicate]) is False
+        assert User.count() == 28
+
+    def test_iter_all(self):
+        """
+        Test iterating in batches.
+
+        Test every row is produced, whatever the batch size, and
+        iter_filter filters them.
+        """
+        assert sorted(user.username for user in User.iter_all(
+            batch_size=2)) == ['ada', 'bayo', 'chidi']
+        assert [user.username for user in User.iter_filter(
+            batch_size=2, username='bayo')] == ['bayo']
+
+    def test_delete_where(self):
+        """
+        Test deleting in bulk.
+
+        Test the users matching the filters are deleted.
+        """
+        assert User.delete_where(User.username != 'ada') is True
+        assert [user.username for user in User.fetch_all()] == ['ada']
+
+    def test_batch(self):
+        """
+        Test a batch of writes.
+
+        Test saves and deletes in a batch block are only written when the
+        block ends.
+        """
+        with User.batch() as batch:
+            for i in range(5):
+                user = User(username='user{}'.format(i), password='x',
+                            email='user{}@user.com'.format(i))
+                assert user.save() is True
+            assert User.find_first(username='ada').delete() is True
+            assert User.count() == 3
+        assert batch.ok is True
+        assert User.count() == 7
+        assert User.find_first(username='ada') is None
+
+    def test_count_is_cached(self):
+        """
+        Test the count cache.
+
+        Test counts are served from the cache until the model is written
+        through its helpers.
+        """
+        assert User.count() == 3
+        assert User.filter_and_count(username='ada') == 1
+        db.session.execute(User.__table__.delete())
+        db.session.commit()
+        assert User.count() == 3
+
+        user = User(username='dayo', email='dayo@user.com', password='x')
+        assert user.save() is True
+        assert User.count() == 1
+        assert User.filter_and_count(username='ada') == 0
@@ -0,0 +1,47 @@
+"""Write test for the in-process caches."""
+import time
+
+from headline.cache import TTLCache
+
+
+def test_cache_hits_and_misses():
+    """
+    Test cache counters.
+
+    Test hits and misses are counted.
+    """
+    cache = TTLCache(maxsize=10, ttl=60)
+    assert cache.get('a') is None
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    """
+    Test cache size bound.
+
+    Test the least recently used entry is evicted once the cache is full.
+    """
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_cache_entries_expire():
+    """
+    Test cache TTL.
+
+    Test entries are no longer returned once their TTL has passed.
+    """
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set('a', 1)
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
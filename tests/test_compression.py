@@ -0,0 +1,121 @@
+"""
+Test response compression.
+
+Test large responses are compressed with the coding the client accepts,
+and small or streamed ones are left alone.
+"""
+import gzip
+import json
+import unittest
+import zlib
+
+from flask import request
+
+from headline import create_app
+from headline.compression import compression_stats
+from headline.conditional import conditional
+from headline.jsend import stream_success, success
+
+
+class TestCompression(unittest.TestCase):
+    """The class encompasses the test cases for response compression."""
+
+    def setUp(self):
+        """
+        Set up the application for testing.
+
+        The method 'setUp' starts the application in test mode with routes
+        listing a given number of items.
+        """
+        self.app = create_app('testing')
+
+        @self.app.route('/items/<int:count>')
+        def items(count):
+            return success([{'n': n} for n in range(count)])
+
+        @self.app.route('/items/<int:count>/stream')
+        def streamed_items(count):
+            return stream_success({'n': n} for n in range(count))
+
+        @self.app.route('/echo')
+        @conditional(lambda: 1)
+        def echo():
+            return success({'who': request.headers['X-Who'] * 1000})
+
+        self.client = self.app.test_client()
+
+    def get(self, url, encoding):
+        return self.client.get(url, headers={'Accept-Encoding': encoding})
+
+    def test_gzip(self):
+        """
+        Test gzip.
+
+        Test a large response is gzipped and a repeat is served from the
+        cache.
+        """
+        response = self.get('/items/500', 'gzip, deflate')
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        body = json.loads(gzip.decompress(response.get_data()).decode())
+        assert len(body['data']) == 500
+
+        self.get('/items/500', 'gzip, deflate')
+        stats = compression_stats(self.app)
+        assert stats['responses'] == 2 and stats['cache_hits'] == 1
+        assert stats['bytes_out'] < stats['bytes_in']
+
+    def test_coded_etags(self):
+        """
+        Test the ETags of compressed responses.
+
+        Test each coding gets an ETag of its own, revalidated with a 304.
+        """
+        plain = self.get('/items/500', 'identity').headers['ETag']
+        response = self.get('/items/500', 'gzip')
+        assert response.headers['ETag'] == plain[:-1] + '-gzip"'
+
+        response = self.client.get('/items/500', headers={
+            'Accept-Encoding': 'gzip',
+            'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == plain[:-1] + '-gzip"'
+
+    def test_cache_follows_body(self):
+        """
+        Test the compressed-bytes cache.
+
+        Test responses sharing an ETag but not a body are not served each
+        other's compressed bytes.
+        """
+        tags = set()
+        for who in ('alice', 'bob'):
+            response = self.client.get('/echo', headers={
+                'Accept-Encoding': 'gzip', 'X-Who': who})
+            tags.add(response.headers['ETag'])
+            body = json.loads(gzip.decompress(response.get_data()).decode())
+            assert body['data']['who'].startswith(who)
+        assert len(tags) == 1
+
+    def test_deflate(self):
+        """
+        Test deflate.
+
+        Test deflate is used when the client prefers it.
+        """
+        response = self.get('/items/500', 'gzip;q=0.5, deflate')
+        assert response.headers['Content-Encoding'] == 'deflate'
+        assert json.loads(zlib.decompress(response.get_data()).decode())
+
+    def test_skipped(self):
+        """
+        Test uncompressed responses.
+
+        Test small, streamed and unaccepted responses are sent as they are.
+        """
+        for url, encoding in (('/items/2', 'gzip'),
+                              ('/items/500/stream', 'gzip'),
+                              ('/items/500', 'identity')):
+            response = self.get(url, encoding)
+            assert 'Content-Encoding' not in response.headers
+            assert json.loads(response.get_data(as_text=True))
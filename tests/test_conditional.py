@@ -0,0 +1,125 @@
+"""
+Test conditional GET.
+
+Test responses carry ETags and Cache-Control, and unchanged resources are
+answered with 304.
+"""
+import base64
+import unittest
+
+from flask import g
+
+from headline import db, create_app
+from headline.auth.views import auth
+from headline.conditional import conditional
+from headline.helpers import paginate
+from headline.models import User
+
+
+class TestConditional(unittest.TestCase):
+    """The class encompasses the test cases for conditional GET."""
+
+    def setUp(self):
+        """
+        Set up the application for testing.
+
+        The method 'setUp' starts the application in test mode with a few
+        users and a listing route versioned by User.version.
+        """
+        self.app = create_app('testing')
+        self.app.config['CACHE_CONTROL'] = {'list_users': 'max-age=30'}
+        self.listed = 0
+
+        @self.app.route('/users')
+        @conditional(lambda: User.version())
+        @paginate(collection='users')
+        def list_users():
+            self.listed += 1
+            return User.query
+
+        @self.app.route('/whoami')
+        @auth.login_required
+        @conditional(lambda: User.version())
+        def whoami():
+            return g.user.username
+
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        User.save_all([User(username='user{}'.format(i), password='x',
+                            email='user{}@user.com'.format(i))
+                       for i in range(3)])
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_versioned_route(self):
+        """
+        Test version ETags.
+
+        Test a matching If-None-Match is answered with 304 without running
+        the view, and an update changes the ETag.
+        """
+        response = self.client.get('/users')
+        etag = response.headers['ETag']
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'max-age=30'
+
+        response = self.client.get('/users',
+                                   headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert self.listed == 1
+
+        user = User.query.first()
+        user.username = 'renamed'
+        user.save()
+        response = self.client.get('/users',
+                                   headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_content_etag(self):
+        """
+        Test content ETags.
+
+        Test jsend.success responses are tagged with a hash of their body
+        and revalidated with it.
+        """
+        user = User.query.first()
+        token = base64.b64encode(user.generate_auth_token() + b':')
+        headers = {'Authorization': b'Basic ' + token}
+        response = self.client.get('/auth/me', headers=headers)
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+
+        headers['If-None-Match'] = response.headers['ETag']
+        response = self.client.get('/auth/me', headers=headers)
+        assert response.status_code == 304
+
+    def test_versioned_route_per_user(self):
+        """
+        Test version ETags of per-user routes.
+
+        Test callers get ETags of their own, so one user's ETag is not
+        answered with a 304 for another.
+        """
+        users = User.query.order_by(User.username).limit(2).all()
+        tags = []
+        for user in users:
+            token = base64.b64encode(user.generate_auth_token() + b':')
+            response = self.client.get(
+                '/whoami', headers={'Authorization': b'Basic ' + token})
+            assert response.get_data(as_text=True) == user.username
+            assert 'Authorization' in response.headers['Vary']
+            tags.append(response.headers['ETag'])
+        assert tags[0] != tags[1]
+
+        token = base64.b64encode(users[1].generate_auth_token() + b':')
+        response = self.client.get('/whoami', headers={
+            'Authorization': b'Basic ' + token, 'If-None-Match': tags[0]})
+        assert response.status_code == 200
+        assert response.get_data(as_text=True) == users[1].username
@@ -0,0 +1,90 @@
+"""
+Test response encoding.
+
+Test every available JSON engine encodes like Flask's encoder, and that
+error responses are encoded once.
+"""
+from datetime import datetime
+import json
+import unittest
+
+from flask import json as flask_json
+
+from headline import create_app, encoding, errors
+
+
+class TestEncoding(unittest.TestCase):
+    """The class encompasses the test cases for response encoding."""
+
+    def setUp(self):
+        """
+        Set up the application for testing.
+
+        The method 'setUp' starts the application in test mode.
+        """
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_engines_match_flask(self):
+        """
+        Test the JSON engines.
+
+        Test each installed engine encodes dates, nesting and big integers
+        like Flask does, compactly and with sorted keys.
+        """
+        data = {'b': [1, 2.5, None, True], 'a': 'naïve',
+                'date': datetime(2017, 10, 1, 12, 30), 'big': 2 ** 70,
+                'nested': {'z': 1, 'y': {}}}
+        expected = json.loads(flask_json.dumps(data))
+        for name, engine in encoding.ENGINES.items():
+            if engine is None:
+                continue
+            self.app.config['JSON_ENGINE'] = name
+            encoding.configure(self.app)
+            body = encoding.dumps(data)
+            assert json.loads(body) == expected, name
+            assert '": ' not in body and ', ' not in body.replace(
+                expected['date'], '')
+            assert body.index('"a"') < body.index('"b"')
+
+    def test_pretty_print(self):
+        """
+        Test pretty printing.
+
+        Test responses are indented when JSONIFY_PRETTYPRINT_REGULAR is
+        set.
+        """
+        assert encoding.jsonify(a=1).get_data() == b'{"a":1}'
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+        assert encoding.jsonify(a=1).get_data() == b'{\n  "a": 1\n}\n'
+
+    def test_errors_are_encoded_once(self):
+        """
+        Test error envelopes.
+
+        Test an error message is encoded once and reused.
+        """
+        first, status = errors.bad_request('Email field is missing.')
+        second, _ = errors.bad_request('Email field is missing.')
+        assert status == first.status_code == 400
+        assert first.get_data() == second.get_data()
+        assert json.loads(first.get_data(as_text=True)) == {
+            'status': 'error',
+            'details': {'status': 400, 'error': 'Bad Request',
+                        'message': 'Email field is missing.'}}
+        assert errors._envelope.cache_info().hits >= 1
+
+    def test_not_found_handler(self):
+        """
+        Test the 404 handler.
+
+        Test unknown URLs get the custom 404 body.
+        """
+        response = self.app.test_client().get('/nowhere')
+        assert response.status_code == 404
+        assert json.loads(response.get_data(as_text=True))['error'] == \
+            'Not found'
@@ -0,0 +1,91 @@
+"""
+Test helpers.
+
+Test the decorators shared by the application's routes.
+"""
+import json
+import unittest
+
+from headline import db, create_app
+from headline.helpers import paginate
+from headline.models import User
+
+
+class TestPaginate(unittest.TestCase):
+    """The class encompasses the test cases for the paginate decorator."""
+
+    def setUp(self):
+        """
+        Set up the application for testing.
+
+        The method 'setUp' starts the application in test mode with 25
+        users and two routes listing them.
+        """
+        self.app = create_app('testing')
+
+        @self.app.route('/users')
+        @paginate(collection='users')
+        def list_users():
+            return User.query
+
+        @self.app.route('/users/cursor')
+        @paginate(collection='users', cursor=True)
+        def list_users_by_cursor():
+            return User.query
+
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        User.save_all([User(username='user{:02d}'.format(i), password='x',
+                            email='user{}@user.com'.format(i))
+                       for i in range(25)])
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def get(self, url):
+        response = self.client.get(url)
+        assert response.status_code == 200
+        return json.loads(response.data)
+
+    def test_offset_pages(self):
+        """
+        Test numbered pages.
+
+        Test a numbered page holds its slice of the collection and totals.
+        """
+        body = self.get('/users?page=2&limit=10')
+        assert [user['username'] for user in body['users']] == \
+            ['user{:02d}'.format(i) for i in range(10, 20)]
+        assert body['meta']['total'] == 25
+        assert body['meta']['exact'] is True
+        assert body['meta']['pages'] == 3
+        assert 'page=3' in body['meta']['next']
+        assert 'page=1' in body['meta']['prev']
+
+    def test_cursor_pages(self):
+        """
+        Test cursor pages.
+
+        Test following next cursors walks the whole collection in order and
+        prev cursors walk back, without totals.
+        """
+        body = self.get('/users/cursor?limit=10')
+        assert 'total' not in body['meta']
+        assert body['meta']['prev'] is None
+        usernames = [user['username'] for user in body['users']]
+        while body['meta']['next']:
+            body = self.get(body['meta']['next'])
+            usernames += [user['username'] for user in body['users']]
+        assert usernames == ['user{:02d}'.format(i) for i in range(25)]
+
+        body = self.get(body['meta']['prev'])
+        assert [user['username'] for user in body['users']] == \
+            ['user{:02d}'.format(i) for i in range(10, 20)]
+        body = self.get(body['meta']['prev'])
+        assert [user['username'] for user in body['users']] == \
+            ['user{:02d}'.format(i) for i in range(10)]
+        assert body['meta']['prev'] is None
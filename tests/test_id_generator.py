@@ -0,0 +1,139 @@
+"""Write test for the push ID generator."""
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from headline.id_generator import LocalPushID, PushID
+
+# Shared with the forked pool workers in test_forked_workers_are_reseeded.
+forked_push_id = LocalPushID()
+
+
+def test_next_id_length():
+    """
+    Test push ID length.
+
+    Test a generated push ID is made up of 20 push characters.
+    """
+    unique_id = PushID().next_id()
+    assert len(unique_id) == 20
+    assert set(unique_id) <= set(PushID.PUSH_CHARS)
+
+
+def test_next_id_is_monotonic():
+    """
+    Test push ID ordering.
+
+    Test IDs generated one after the other sort in generation order.
+    """
+    generator = PushID()
+    ids = [generator.next_id() for _ in range(1000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_next_ids_batch_is_monotonic():
+    """
+    Test batch generation.
+
+    Test a batch of IDs is unique, sorted and sorts after earlier IDs.
+    """
+    generator = PushID()
+    first = generator.next_id()
+    batch = generator.next_ids(500)
+    last = generator.next_id()
+    assert len(batch) == 500
+    assert len(set(batch)) == 500
+    assert [first] + batch + [last] == sorted([first] + batch + [last])
+
+
+def test_encode_time_sorts_lexicographically():
+    """
+    Test timestamp encoding.
+
+    Test later timestamps encode to strings that sort after earlier ones.
+    """
+    encoded = [PushID.encode_time(now) for now in (0, 63, 64, 4095, 4096,
+                                                   1508000000000)]
+    assert encoded == sorted(encoded)
+    assert PushID.encode_time(0) == '--------'
+
+
+def test_node_is_embedded():
+    """
+    Test node discriminator.
+
+    Test the node characters start the random section of every ID.
+    """
+    generator = PushID(node='a1')
+    assert generator.next_id()[8:10] == 'a1'
+    assert all(unique_id[8:10] == 'a1' for unique_id in generator.next_ids(50))
+
+
+def test_threads_do_not_collide():
+    """
+    Stress test per-thread generators.
+
+    Test many threads generating at once produce no duplicate IDs.
+    """
+    generator = LocalPushID()
+    results = []
+
+    def work():
+        results.append([generator.next_id() for _ in range(2000)] +
+                       generator.next_ids(2000))
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = [unique_id for batch in results for unique_id in batch]
+    assert len(ids) == 8 * 4000
+    assert len(ids) - len(set(ids)) == 0
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires os.fork')
+def test_forked_workers_are_reseeded():
+    """
+    Test generators after fork.
+
+    Test forked workers don't reuse the random state of their parent.
+    """
+    forked_push_id.next_id()
+    context = multiprocessing.get_context('fork')
+    with context.Pool(4) as pool:
+        batches = pool.map(_generate_batch, range(4))
+    ids = [unique_id for batch in batches for unique_id in batch]
+    assert len(ids) == len(set(ids))
+
+
+def _generate_batch(_):
+    return forked_push_id.next_ids(1000)
+
+
+def test_decode_timestamp_round_trip():
+    """
+    Test timestamp decoding.
+
+    Test the timestamp of a push ID can be read back from it.
+    """
+    before = int(time.time() * 1000)
+    unique_id = PushID().next_id()
+    after = int(time.time() * 1000)
+    assert before <= PushID.decode_timestamp(unique_id) <= after
+
+
+def test_lower_bound_brackets_ids():
+    """
+    Test push ID lower bounds.
+
+    Test IDs from a millisecond sort between its bound and the next one.
+    """
+    unique_id = PushID().next_id()
+    now = PushID.decode_timestamp(unique_id)
+    assert PushID.lower_bound(now) <= unique_id < PushID.lower_bound(now + 1)
@@ -0,0 +1,128 @@
+"""
+Test the bulk user import.
+
+Test users are imported from files in chunks and imports resume.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from headline import db, create_app
+from headline.importer import ImportFailed, import_users
+from headline.models import User
+
+
+class TestImporter(unittest.TestCase):
+    """The class encompasses the test cases for importing users."""
+
+    def setUp(self):
+        """
+        Set up the application for testing.
+
+        The method 'setUp' starts the application in test mode and writes
+        an input file with five users.
+        """
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'users.jsonl')
+        with open(self.path, 'w') as users:
+            for i in range(5):
+                users.write(json.dumps({
+                    'username': 'user{}'.format(i),
+                    'email': 'user{}@headline.ng'.format(i),
+                    'password': 'password{}'.format(i)}) + '\n')
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.directory)
+
+    def test_import_users(self):
+        """
+        Test importing users.
+
+        Test every user is imported in chunks and can sign in.
+        """
+        assert import_users(self.path, chunk_size=2, workers=1,
+                            report=lambda message: None) == 5
+        assert User.count() == 5
+        assert User.find_first(username='user3').verify_password('password3')
+        assert not os.path.exists(self.path + '.checkpoint')
+
+    def test_import_resumes(self):
+        """
+        Test resuming an import.
+
+        Test a failed import stops after its last committed chunk and picks
+        up from there once the input is fixed.
+        """
+        with open(self.path, 'a') as users:
+            users.write(json.dumps({'username': 'user0', 'email': 'x@y.ng',
+                                    'password': 'password'}) + '\n')
+        with self.assertRaises(ImportFailed):
+            import_users(self.path, chunk_size=2, workers=0,
+                         report=lambda message: None)
+        assert User.count() == 4
+
+        with open(self.path) as users:
+            lines = users.readlines()
+        with open(self.path, 'w') as users:
+            users.writelines(lines[:-1] + [lines[-1].replace('"user0"',
+                                                             '"user5"')])
+        assert import_users(self.path, chunk_size=2, workers=0,
+                            report=lambda message: None) == 2
+        assert User.count() == 6
+
+    def test_resume_after_unrecorded_commit(self):
+        """
+        Test resuming after a crash between a commit and its checkpoint.
+
+        Test the rows of the chunk being written when the import died are
+        not inserted again.
+        """
+        import_users(self.path, chunk_size=2, workers=0,
+                     report=lambda message: None)
+        User.query.filter(User.username.in_(
+            ['user2', 'user3', 'user4'])).delete(synchronize_session=False)
+        db.session.commit()
+        with open(self.path + '.checkpoint', 'w') as state:
+            state.write('0 2')
+        assert import_users(self.path, chunk_size=2, workers=0,
+                            report=lambda message: None) == 3
+        assert User.count() == 5
+
+    def test_duplicate_fails_again_on_rerun(self):
+        """
+        Test rerunning an import with a duplicate.
+
+        Test a row repeating an existing user fails the import every time
+        it is run, not only the first.
+        """
+        with open(self.path, 'a') as users:
+            users.write(json.dumps({'username': 'user0',
+                                    'email': 'user0@headline.ng',
+                                    'password': 'password'}) + '\n')
+        for _ in range(2):
+            with self.assertRaises(ImportFailed):
+                import_users(self.path, chunk_size=2, workers=0,
+                             report=lambda message: None)
+        assert User.count() == 4
+
+    def test_malformed_row(self):
+        """
+        Test malformed rows.
+
+        Test a row missing a required field fails the import naming it.
+        """
+        with open(self.path, 'a') as users:
+            users.write(json.dumps({'username': 'user5'}) + '\n')
+        with self.assertRaisesRegex(ImportFailed, 'Row 6:'):
+            import_users(self.path, chunk_size=2, workers=0,
+                         report=lambda message: None)
+        assert User.count() == 4
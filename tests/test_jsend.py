@@ -0,0 +1,45 @@
+"""
+Test JSend responses.
+
+Test streamed responses carry the same envelope as jsonified ones.
+"""
+import json
+import unittest
+
+from headline import create_app
+from headline.jsend import stream_success
+
+
+class TestStreamSuccess(unittest.TestCase):
+    """The class encompasses the test cases for streamed responses."""
+
+    def setUp(self):
+        """
+        Set up the application for testing.
+
+        The method 'setUp' starts the application in test mode with a route
+        streaming a generated listing.
+        """
+        self.app = create_app('testing')
+
+        @self.app.route('/numbers/<int:count>')
+        def numbers(count):
+            return stream_success(({'n': n} for n in range(count)),
+                                  chunk_size=3)
+
+        self.client = self.app.test_client()
+
+    def test_stream_success(self):
+        """
+        Test streaming.
+
+        Test the streamed body is the JSend envelope of every item, whether
+        the items fill whole chunks or not.
+        """
+        for count in (0, 3, 7):
+            response = self.client.get('/numbers/{}'.format(count))
+            assert response.is_streamed
+            assert json.loads(response.get_data(as_text=True)) == {
+                'status': 'success',
+                'data': [{'n': n} for n in range(count)]
+            }
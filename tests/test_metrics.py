@@ -0,0 +1,98 @@
+"""
+Test request metrics.
+
+Test requests are counted, timed and served on /metrics, and the numbers
+of several workers are added up.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from headline import db, create_app
+from headline.metrics import FileStore, merge
+
+
+class TestMetrics(unittest.TestCase):
+    """The class encompasses the test cases for request metrics."""
+
+    def setUp(self):
+        """
+        Set up the application for testing.
+
+        The method 'setUp' starts the application in test mode, sharing
+        its metrics through a temporary directory, with a failing route.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.app = create_app('testing')
+        self.app.config['METRICS_DIR'] = self.directory
+        self.app.config['PRESERVE_CONTEXT_ON_EXCEPTION'] = False
+
+        @self.app.route('/fail')
+        def fail():
+            raise RuntimeError('failed')
+
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.directory)
+
+    def metrics(self):
+        response = self.client.get('/metrics')
+        assert response.status_code == 200
+        return response.get_data(as_text=True).splitlines()
+
+    def test_requests_are_recorded(self):
+        """
+        Test recording.
+
+        Test statuses, latency histograms and failing requests show up on
+        /metrics.
+        """
+        self.client.get('/auth/me')
+        self.client.get('/nowhere')
+        with self.assertRaises(RuntimeError):
+            self.client.get('/fail')
+        lines = self.metrics()
+        assert 'headline_requests_total{endpoint="authentication.'\
+            'current_user",status="401"} 1' in lines
+        assert 'headline_requests_total{endpoint="unmatched",status="404"} 1' \
+            in lines
+        assert 'headline_requests_total{endpoint="fail",status="500"} 1' \
+            in lines
+        assert 'headline_request_duration_seconds_count{endpoint="fail"} 1' \
+            in lines
+        assert 'headline_request_duration_seconds_bucket{endpoint="fail",'\
+            'le="+Inf"} 1' in lines
+        assert 'headline_requests_in_flight 1' in lines
+
+    def test_workers_are_added_up(self):
+        """
+        Test aggregation.
+
+        Test the files of other workers are added to this one's, those of
+        exited workers are folded into one without counting them twice,
+        and their requests in flight are dropped.
+        """
+        self.client.get('/auth/me')
+        exited = merge([self.app.extensions['metrics'].snapshot()])
+        FileStore(self.directory).write({
+            'pid': 2 ** 22 + 1, 'nonce': 'a', 'bounds': [0.1],
+            'in_flight': 3,
+            'series': {'authentication.current_user': [[2, 0], 0.05, 2, 0]},
+            'statuses': [['authentication.current_user', 401, 2]]})
+        assert exited['statuses'][('authentication.current_user', 401)] == 1
+        for _ in range(2):
+            lines = self.metrics()
+            assert 'headline_requests_total{endpoint="authentication.'\
+                'current_user",status="401"} 3' in lines
+            assert 'headline_requests_in_flight 1' in lines
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.endswith('.json'))
+        assert len(names) == 2 and FileStore.RETIRED in names
@@ -0,0 +1,81 @@
+"""
+Test connection pool instrumentation.
+
+Test the application's engines are instrumented and a queue pool reports
+its checkouts, connections in use and invalidations.
+"""
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+
+from headline import db, create_app
+from headline.models import User
+from headline.pool import InstrumentedQueuePool, instrument, pool_status
+
+
+class TestPool(unittest.TestCase):
+    """The class encompasses the test cases for pool instrumentation."""
+
+    def setUp(self):
+        """
+        Set up the application for testing.
+
+        The method 'setUp' starts the application in test mode.
+        """
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_default_engine_is_instrumented(self):
+        """
+        Test the default engine.
+
+        Test queries through the session are counted.
+        """
+        User.query.count()
+        db.session.remove()
+        stats = pool_status(self.app)['default']
+        assert stats['pool'] == 'NullPool'
+        assert stats['checkouts'] >= 1
+        assert stats['in_use'] == 0
+
+    def test_queue_pool_stats(self):
+        """
+        Test queue pool statistics.
+
+        Test checkouts, connections in use, the pool's size and
+        invalidations are reported, and pre-ping leaves live connections be.
+        """
+        handle, path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        self.app.config['SQLALCHEMY_POOL_PRE_PING'] = True
+        engine = create_engine('sqlite:///' + path,
+                               poolclass=InstrumentedQueuePool, pool_size=2)
+        try:
+            instrument(self.app, 'queue', engine)
+            first, second = engine.connect(), engine.connect()
+            stats = pool_status(self.app)['queue']
+            assert stats['in_use'] == stats['max_in_use'] == 2
+            assert stats['size'] == 2
+            assert stats['connects'] == 2
+
+            first.invalidate()
+            first.close()
+            second.close()
+            engine.connect().close()
+            stats = pool_status(self.app)['queue']
+            assert stats['checkouts'] == 3
+            assert stats['in_use'] == 0
+            assert stats['invalidations'] == 1
+            assert stats['wait_max_ms'] >= 0
+        finally:
+            engine.dispose()
+            os.remove(path)
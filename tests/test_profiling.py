@@ -0,0 +1,83 @@
+"""
+Test SQL profiling.
+
+Test requests report their statements in a Server-Timing header, are
+summarized per endpoint and repeated statements are flagged.
+"""
+import unittest
+
+from headline import db, create_app, profiling
+from headline.models import User
+
+
+class TestProfiling(unittest.TestCase):
+    """The class encompasses the test cases for SQL profiling."""
+
+    def setUp(self):
+        """
+        Set up the application for testing.
+
+        The method 'setUp' starts the application in test mode with SQL
+        profiling and a route looking users up one by one.
+        """
+        self.app = create_app('testing')
+        self.app.config['SQL_PROFILING'] = True
+        profiling.init_app(self.app)
+
+        @self.app.route('/users/one-by-one')
+        def users_one_by_one():
+            for i in range(6):
+                User.query.filter_by(username='user{}'.format(i)).first()
+            return 'ok'
+
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_server_timing(self):
+        """
+        Test the Server-Timing header.
+
+        Test the statements of a request are counted in the header and
+        the endpoint's summary.
+        """
+        response = self.client.get('/users/one-by-one')
+        timings = response.headers.getlist('Server-Timing')
+        assert timings[0].startswith('db;dur=')
+        assert timings[0].endswith('desc="6 queries"')
+        assert timings[1].startswith('total;dur=')
+        summary = profiling.sql_summary(self.app)['users_one_by_one']
+        assert summary['requests'] == 1
+        assert summary['statements_max'] == 6
+
+    def test_repeated_statements_are_flagged(self):
+        """
+        Test N+1 detection.
+
+        Test a statement repeated past the threshold is counted as
+        repeated in the endpoint's summary.
+        """
+        self.client.get('/users/one-by-one')
+        summary = profiling.sql_summary(self.app)['users_one_by_one']
+        assert summary['repeated'] == 1
+
+    def test_failed_statements_are_not_left_behind(self):
+        """
+        Test failing statements.
+
+        Test the start time of a statement that raises is dropped from its
+        pooled connection.
+        """
+        with self.app.test_request_context():
+            self.app.preprocess_request()
+            connection = db.session.connection()
+            with self.assertRaises(Exception):
+                connection.execute('SELECT * FROM missing_table')
+            assert not connection.info.get('profile_start')
+            db.session.rollback()
@@ -0,0 +1,79 @@
+"""
+Test read replica routing.
+
+Test reads go to a replica and writes, and the reads after them, go to the
+primary. A second SQLite database stands in for the replica.
+"""
+import os
+import tempfile
+import unittest
+
+from headline import db, create_app, replicas
+from headline.models import User
+
+
+class TestReplicas(unittest.TestCase):
+    """The class encompasses the test cases for read replica routing."""
+
+    def setUp(self):
+        """
+        Set up the application for testing.
+
+        The method 'setUp' starts the application in test mode with a
+        replica holding one user the primary doesn't have.
+        """
+        handle, self.replica_path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        self.app = create_app('testing')
+        self.app.config['SQLALCHEMY_REPLICA_URIS'] = [
+            'sqlite:///' + self.replica_path]
+        replicas.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.replica = self.app.extensions['replicas'].engines[0]
+        User.metadata.create_all(bind=self.replica)
+        self.replica.execute(User.__table__.insert().values(
+            id='replica', username='replica_user', email='r@user.com',
+            password='x'))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.replica.dispose()
+        os.remove(self.replica_path)
+
+    def test_reads_go_to_replica(self):
+        """
+        Test read routing.
+
+        Test queries read the replica's data.
+        """
+        assert [user.username for user in User.fetch_all()] == \
+            ['replica_user']
+
+    def test_reads_after_write_go_to_primary(self):
+        """
+        Test read your writes.
+
+        Test a session that wrote reads from the primary until it ends.
+        """
+        user = User(username='primary_user', email='p@user.com', password='x')
+        assert user.save() is True
+        assert [user.username for user in User.fetch_all()] == \
+            ['primary_user']
+
+        db.session.remove()
+        assert [user.username for user in User.fetch_all()] == \
+            ['replica_user']
+
+    def test_unhealthy_replica_is_skipped(self):
+        """
+        Test replica health.
+
+        Test reads fall back to the primary while the replica is down.
+        """
+        self.app.extensions['replicas'].mark_down(self.replica)
+        assert User.fetch_all() == []
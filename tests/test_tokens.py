@@ -0,0 +1,51 @@
+"""Write test for the token codec."""
+from itsdangerous import TimedJSONWebSignatureSerializer
+
+from headline.tokens import TokenCodec
+
+
+def test_token_round_trip():
+    """
+    Test token encoding.
+
+    Test a token decodes to the payload it was issued for.
+    """
+    codec = TokenCodec(['new_key'])
+    token = codec.dumps({'id': 'abc'}, 60)
+    assert isinstance(token, bytes)
+    assert codec.loads(token)['id'] == 'abc'
+    assert codec.loads(token + b'x') is None
+
+
+def test_expired_token():
+    """
+    Test token expiry.
+
+    Test a token is rejected once it has expired.
+    """
+    codec = TokenCodec(['new_key'])
+    assert codec.loads(codec.dumps({'id': 'abc'}, -1)) is None
+
+
+def test_key_rotation():
+    """
+    Test the key ring.
+
+    Test tokens signed with a retired key are still accepted while the key
+    is in the ring, and rejected once it is dropped.
+    """
+    token = TokenCodec(['old_key']).dumps({'id': 'abc'}, 60)
+    assert TokenCodec(['new_key', 'old_key']).loads(token)['id'] == 'abc'
+    assert TokenCodec(['new_key']).loads(token) is None
+
+
+def test_legacy_token():
+    """
+    Test legacy tokens.
+
+    Test JSON web signature tokens are only accepted when asked for.
+    """
+    token = TimedJSONWebSignatureSerializer('key', expires_in=60).dumps(
+        {'id': 'abc'})
+    assert TokenCodec(['key'], accept_legacy=True).loads(token)['id'] == 'abc'
+    assert TokenCodec(['key']).loads(token) is None
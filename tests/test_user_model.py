@@ -1,6 +1,11 @@
 """Write test for models."""
+from datetime import datetime
+import os
+import signal
+
 import pytest
 
+from headline.hashing import HashingBusy, PasswordHasher
 from headline.models import User
 
 
@@ -38,3 +43,94 @@ def test_password_hash_isnt_similar():
     user2 = User(username='test2')
     user2.hash_password('cat')
     assert user.password != user2.password
+
+
+def test_password_hashing_on_pool():
+    """
+    Test hashing on the worker pool.
+
+    Test passwords hashed on worker processes can be checked there too.
+    """
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, queue_size=1)
+    pwhash = hasher.hash('cat')
+    assert pwhash.startswith('pbkdf2:sha256:1000$')
+    assert hasher.check(pwhash, 'cat') is True
+    assert hasher.check(pwhash, 'dog') is False
+    hasher.configure('pbkdf2:sha256:1000', 0, 0, 5)
+
+
+def test_password_hashing_when_busy():
+    """
+    Test a saturated pool.
+
+    Test HashingBusy is raised when no hashing slot frees up in time.
+    """
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, timeout=0.01)
+    hasher._slots.acquire()
+    with pytest.raises(HashingBusy):
+        hasher.hash('cat')
+    hasher.configure('pbkdf2:sha256:1000', 0, 0, 5)
+
+
+def test_password_hashing_after_worker_died():
+    """
+    Test a broken pool.
+
+    Test hashing works again after the pool's processes were killed.
+    """
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=2, queue_size=1)
+    hasher.hash('cat')
+    processes = list(hasher._pool._processes.values())
+    for process in processes:
+        os.kill(process.pid, signal.SIGKILL)
+    for process in processes:
+        process.join()
+    assert hasher.check(hasher.hash('cat'), 'cat') is True
+    assert hasher.hash('dog').startswith('pbkdf2:sha256:1000$')
+    hasher.configure('pbkdf2:sha256:1000', 0, 0, 5)
+
+
+def test_password_needs_rehash():
+    """
+    Test outdated password hashes.
+
+    Test hashes made with another work factor are flagged for rehashing.
+    """
+    hasher = PasswordHasher('pbkdf2:sha256:1000')
+    assert hasher.needs_rehash(hasher.hash('cat')) is False
+    assert hasher.needs_rehash(
+        PasswordHasher('pbkdf2:sha256:2000').hash('cat')) is True
+
+
+def test_serialize():
+    """
+    Test serializing a user.
+
+    Test every column is mapped to its camel case key, or only the
+    requested ones.
+    """
+    user = User(id='abc', username='test', email='test@user.com',
+                date_created=datetime(2017, 10, 1, 12, 30))
+    serialized = user.serialize()
+    assert serialized['id'] == 'abc'
+    assert serialized['dateCreated'] == datetime(2017, 10, 1, 12, 30)
+    assert set(serialized) == {'id', 'dateCreated', 'dateModified',
+                               'username', 'password', 'email',
+                               'isverified', 'tokenVersion'}
+    assert user.serialize(fields=['username', 'dateCreated']) == {
+        'username': 'test', 'dateCreated': datetime(2017, 10, 1, 12, 30)}
+
+
+def test_serialize_many():
+    """
+    Test serializing users in bulk.
+
+    Test dates are formatted the way the JSON encoder formats them.
+    """
+    created = datetime(2017, 10, 1, 12, 30)
+    users = [User(id=str(i), username='user{}'.format(i),
+                  date_created=created) for i in range(3)]
+    serialized = User.serialize_many(users, fields=['id', 'dateCreated'])
+    assert serialized == [
+        {'id': str(i), 'dateCreated': 'Sun, 01 Oct 2017 12:30:00 GMT'}
+        for i in range(3)]
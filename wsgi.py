@@ -0,0 +1,15 @@
+"""
+WSGI entry point for the Headline API.
+
+Servers load the application from here, e.g. `gunicorn --worker-class gthread
+--threads 16 wsgi:app` as in the Procfile. Only the
+application itself is built; the management commands and everything they
+import stay in manage.py.
+"""
+
+import dotenv
+
+from headline import create_app
+
+dotenv.load()
+app = create_app(dotenv.get('FLASK_CONFIG', 'default'))